@@ -1,5 +1,12 @@
 """
 ASGI config for {{ project_name }} project.
+
+A single ASGI application serving both frameworks in one process:
+- `/admin/...` goes to the Django ASGI handler (admin panel).
+- `STATIC_URL` is served from `STATIC_ROOT` (run `collectstatic` first).
+- Anything else (and the lifespan events) goes to FastAPI.
+
+Run it with: `uvicorn app.asgi:application`
 """
 
 import os
@@ -8,4 +15,38 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
 
-application = get_asgi_application()
+
+#######################################
+#       Django ASGI Application       #
+#######################################
+
+django_application = get_asgi_application()
+
+
+#######################################
+#        Combined Application         #
+#######################################
+
+# Imported after django is initialized, see `app.wsgi`
+
+from starlette.staticfiles import StaticFiles  # noqa: E402
+
+from app.settings import STATIC_ROOT, STATIC_URL  # noqa: E402
+from app.wsgi import app as fastapi_application  # noqa: E402
+
+DJANGO_PREFIXES = ("/admin",)
+
+static_application = StaticFiles(directory=str(STATIC_ROOT), check_dir=False)
+
+
+async def application(scope, receive, send):
+    """Dispatch each connection to Django or FastAPI by path prefix"""
+    if scope["type"] == "http":
+        path = scope["path"]
+        if path.startswith(DJANGO_PREFIXES):
+            return await django_application(scope, receive, send)
+        if path.startswith(STATIC_URL):
+            # StaticFiles resolves the path relative to its directory
+            static_scope = dict(scope, path=path[len(STATIC_URL) - 1 :])
+            return await static_application(static_scope, receive, send)
+    return await fastapi_application(scope, receive, send)
@@ -0,0 +1,289 @@
+"""
+Pre-fork production launcher.
+
+The master process imports the whole application once (django setup,
+routes, OpenAPI schema), freezes the GC and then forks the workers, so
+they share those pages copy-on-write instead of building their own.
+Workers are recycled after a number of requests or above a RSS limit.
+
+Usage: `python -m app.prefork --port 3000 --workers 4`
+Send SIGUSR1 to the master to print the memory per worker report.
+
+A crashed worker is logged and replaced with an exponential backoff, the
+master gives up (and exits with an error) after `MAX_QUICK_FAILURES`
+workers in a row die within `QUICK_FAILURE_SECONDS` of their start.
+"""
+
+import argparse
+import gc
+import os
+import random
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Dict
+
+from app.settings import WEB_WORKERS, WORKER_MAX_REQUESTS, WORKER_MAX_RSS_MB
+
+
+#######################################
+#            Memory Report            #
+#######################################
+
+# smaps_rollup fields of the report (kB)
+MEMORY_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Dirty")
+
+
+def memory_usage(pid: int) -> Dict[str, int]:
+    """
+    Memory of a process in kB from /proc (Linux).
+
+    PSS splits the shared pages among the processes sharing them, so the
+    sum of PSS is the real memory used by the master and its workers.
+    """
+    usage = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as smaps:
+            for line in smaps:
+                key, _, value = line.partition(":")
+                if key in MEMORY_FIELDS:
+                    usage[key] = int(value.split()[0])
+    except OSError:
+        pass
+    return usage
+
+
+def memory_report(master: int, workers) -> str:
+    lines = [f"{'pid':>8} {'role':<7} {'rss MB':>9} {'pss MB':>9} {'shared MB':>10}"]
+    totals = {"Rss": 0, "Pss": 0}
+    for pid, role in [(master, "master")] + [(pid, "worker") for pid in workers]:
+        usage = memory_usage(pid)
+        shared = usage.get("Shared_Clean", 0) + usage.get("Shared_Dirty", 0)
+        totals["Rss"] += usage.get("Rss", 0)
+        totals["Pss"] += usage.get("Pss", 0)
+        lines.append(
+            f"{pid:>8} {role:<7} {usage.get('Rss', 0) / 1024:>9.1f}"
+            f" {usage.get('Pss', 0) / 1024:>9.1f} {shared / 1024:>10.1f}"
+        )
+    lines.append(
+        f"{'total':>8} {'':<7} {totals['Rss'] / 1024:>9.1f}"
+        f" {totals['Pss'] / 1024:>9.1f}"
+    )
+    return "\n".join(lines)
+
+
+#######################################
+#               Worker                #
+#######################################
+
+
+class RecyclingApp:
+    """
+    ASGI wrapper that stops the worker gracefully when its RSS grows
+    above the limit (checked every `check_every` requests).
+    """
+
+    def __init__(self, app, max_rss_mb: int, check_every: int = 100):
+        self.app = app
+        self.max_rss_kb = max_rss_mb * 1024
+        self.check_every = check_every
+        self.requests = 0
+        self.server = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and self.max_rss_kb:
+            self.requests += 1
+            if self.requests % self.check_every == 0:
+                rss = memory_usage(os.getpid()).get("Rss", 0)
+                if rss > self.max_rss_kb and self.server is not None:
+                    self.server.should_exit = True
+        await self.app(scope, receive, send)
+
+
+def run_worker(application, sock: socket.socket, args) -> None:
+    """Serve requests in a forked worker until it exits or is recycled"""
+    import uvicorn
+
+    app = RecyclingApp(application, args.max_rss_mb)
+    # Jitter, so the workers are not all recycled at the same time
+    max_requests = None
+    if args.max_requests:
+        max_requests = args.max_requests + random.randint(0, args.max_requests // 10)
+    config = uvicorn.Config(
+        app,
+        lifespan="on",
+        log_level=args.log_level,
+        limit_max_requests=max_requests,
+    )
+    server = uvicorn.Server(config)
+    app.server = server
+    server.run(sockets=[sock])
+
+
+#######################################
+#               Master                #
+#######################################
+
+# A worker that dies this soon after its start is a failed start
+QUICK_FAILURE_SECONDS = 5.0
+MAX_QUICK_FAILURES = 5
+RESPAWN_DELAY = 0.1
+MAX_RESPAWN_DELAY = 10.0
+
+
+def preload():
+    """Load everything the workers share"""
+    from django.db import connections
+
+    from app.asgi import application, fastapi_application
+
+    # The schema is built lazily on the first /docs request otherwise
+    fastapi_application.openapi()
+
+    # Warm the imports deferred to first use, otherwise every
+    # worker would import them after the fork into its private pages:
+    # python-jose and its crypto backends, and the email provider
+    # client (sendgrid, or httpx with EMAIL_TRANSPORT=http). No
+    # connection is opened, the clients connect on the first send.
+    from services.auth.utils import _jose
+    from services.email import sender
+    from services.email.transports import SendGridTransport
+
+    _jose()
+    if isinstance(sender.transport, SendGridTransport):
+        sender.transport.client
+
+    # Never fork an open DB connection
+    connections.close_all()
+
+    # Move the loaded objects to a permanent generation, so the GC of
+    # the workers does not write on (and copy) the shared pages.
+    gc.collect()
+    gc.freeze()
+    return application
+
+
+def describe_exit(status: int) -> str:
+    """Explain a `os.wait` status, empty for a clean exit"""
+    if os.WIFSIGNALED(status):
+        return f"killed by signal {os.WTERMSIG(status)}"
+    code = os.WEXITSTATUS(status)
+    return f"exited with code {code}" if code else ""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--workers", type=int, default=WEB_WORKERS)
+    parser.add_argument("--max-requests", type=int, default=WORKER_MAX_REQUESTS)
+    parser.add_argument("--max-rss-mb", type=int, default=WORKER_MAX_RSS_MB)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument(
+        "--report-after",
+        type=int,
+        default=0,
+        help="Print the memory report N seconds after start",
+    )
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+    application = preload()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    master = os.getpid()
+    # Worker pid -> start time
+    workers: Dict[int, float] = {}
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            # Default handlers, uvicorn installs its own ones
+            for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1, signal.SIGALRM):
+                signal.signal(sig, signal.SIG_DFL)
+            code = 0
+            try:
+                run_worker(application, sock, args)
+            except SystemExit as error:
+                code = error.code if isinstance(error.code, int) else 1
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        workers[pid] = time.monotonic()
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def report(signum, frame) -> None:
+        print(memory_report(master, workers), flush=True)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGUSR1, report)
+    signal.signal(signal.SIGALRM, report)
+
+    for _ in range(args.workers):
+        spawn()
+    print(f"Master {master} serving on {args.host}:{args.port}", flush=True)
+    if args.report_after:
+        signal.alarm(args.report_after)
+
+    quick_failures = 0
+    exit_code = 0
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = workers.pop(pid, None)
+        if stopping or started is None:
+            continue
+
+        # Recycled (clean exit) or crashed worker, replace it
+        failure = describe_exit(status)
+        if not failure:
+            quick_failures = 0
+        else:
+            uptime = time.monotonic() - started
+            print(
+                f"Worker {pid} {failure} after {uptime:.1f}s",
+                file=sys.stderr,
+                flush=True,
+            )
+            quick_failures = quick_failures + 1 if uptime < QUICK_FAILURE_SECONDS else 0
+            if quick_failures >= MAX_QUICK_FAILURES:
+                print(
+                    f"{quick_failures} workers failed on start, giving up",
+                    file=sys.stderr,
+                    flush=True,
+                )
+                exit_code = 1
+                stop(signal.SIGTERM, None)
+                continue
+        time.sleep(min(RESPAWN_DELAY * 2 ** quick_failures, MAX_RESPAWN_DELAY))
+        if not stopping:
+            spawn()
+    sock.close()
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,15 @@ from dotenv import load_dotenv
 # Load from .env file
 load_dotenv()
 
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """A boolean env variable: "1", "true", "yes" or "on" (any case)"""
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -21,7 +30,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.getenv("SECRET_KEY")
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = os.getenv("DEBUG_MODE")
+DEBUG = env_flag("DEBUG_MODE")
 
 # TODO: Change your domain names here.
 ALLOWED_HOSTS = []
@@ -39,6 +48,23 @@ PORT = os.getenv("PORT")
 # the backend, use the frontedn server host.
 SERVER_HOST = os.getenv("SERVER_HOST")
 
+# Pre-fork launcher (`python -m app.prefork`): workers and their recycling
+WEB_WORKERS = int(os.getenv("WEB_WORKERS") or os.cpu_count() or 1)
+WORKER_MAX_REQUESTS = int(os.getenv("WORKER_MAX_REQUESTS") or 10000)
+WORKER_MAX_RSS_MB = int(os.getenv("WORKER_MAX_RSS_MB") or 512)
+
+# The Prometheus /metrics endpoint, keep it off where the API is public
+METRICS_ENABLED = env_flag("METRICS_ENABLED")
+
+# Server-Timing response headers (the default in debug mode)
+SERVER_TIMING = env_flag("SERVER_TIMING", default=DEBUG)
+
+# Responses JSON encoder: "orjson" (used when installed) or "json" (stdlib)
+JSON_ENCODER = os.getenv("JSON_ENCODER") or "orjson"
+
+# Serve the users API with native async handlers
+ASYNC_ROUTERS = env_flag("ASYNC_ROUTERS")
+
 INSTALLED_APPS = [
     # Django Apps
     "django.contrib.admin",
@@ -51,6 +77,7 @@ INSTALLED_APPS = [
     # ...
     # Project Apps
     "users",
+    "mailing",
 ]
 
 MIDDLEWARE = [
@@ -94,17 +121,60 @@ DB_PASSWORD = os.getenv("POSTGRES_PASSWORD")
 DB_HOST = os.getenv("POSTGRES_SERVER")
 DB_PORT = os.getenv("POSTGRES_PORT")
 
+# Max concurrent DB connections per worker, it sizes the connection pool
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS") or 10)
+# Seconds to wait for a free connection before rejecting with 503
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT") or 5)
+# Seconds a connection is reused (0 closes it after each operation)
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE") or 60)
+# Ping reused connections, discard them if Postgres was restarted
+DB_HEALTH_CHECKS = env_flag("DB_HEALTH_CHECKS", default=True)
+# Seconds a connection stays idle before it is pinged again (0 pings each use)
+DB_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_HEALTH_CHECK_INTERVAL") or 30)
+
+# PostgreSQL by default, "django.db.backends.sqlite3" as a local stand-in
+DB_ENGINE = os.getenv("DB_ENGINE") or "django.db.backends.postgresql"
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": DB_ENGINE,
         "NAME": DB_NAME,
         "USER": DB_USER,
         "PASSWORD": DB_PASSWORD,
         "HOST": DB_HOST,
         "PORT": DB_PORT,
+        "CONN_MAX_AGE": DB_CONN_MAX_AGE,
     }
 }
 
+if DB_ENGINE.endswith("sqlite3"):
+    DATABASES["default"] = {
+        "ENGINE": DB_ENGINE,
+        "NAME": DB_NAME or str(BASE_DIR / "db.sqlite3"),
+    }
+
+# Read replicas, comma separated "host[:port]" (db file paths with sqlite).
+# Reads go to them, writes to the primary, and a client that wrote reads
+# from the primary for the next DB_PRIMARY_STICKY_SECONDS.
+DB_REPLICAS = [
+    replica.strip()
+    for replica in (os.getenv("DB_REPLICAS") or "").split(",")
+    if replica.strip()
+]
+DB_PRIMARY_STICKY_SECONDS = int(os.getenv("DB_PRIMARY_STICKY_SECONDS") or 5)
+
+for index, replica in enumerate(DB_REPLICAS, start=1):
+    if DB_ENGINE.endswith("sqlite3"):
+        replica_config = dict(DATABASES["default"], NAME=replica)
+    else:
+        host, _, port = replica.partition(":")
+        replica_config = dict(DATABASES["default"], HOST=host, PORT=port or DB_PORT)
+    # The test runner reads the replicas from the test primary
+    replica_config["TEST"] = {"MIRROR": "default"}
+    DATABASES[f"replica_{index}"] = replica_config
+
+DATABASE_ROUTERS = ["services.db.routers.ReplicaRouter"] if DB_REPLICAS else []
+
 
 #######################################
 #                 Auth                #
@@ -112,6 +182,45 @@ DATABASES = {
 
 AUTH_USER_MODEL = "users.User"
 
+# Per-worker cache of authenticated users (0 disables it)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE") or 1024)
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL") or 30)
+
+# Per-worker memo of already verified JWTs (0 disables it)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE") or 4096)
+
+# Session tokens carry the public user claims, `/current` and the
+# authorization checks need no DB lookup (revocation checked on writes)
+AUTH_FAT_TOKENS = env_flag("AUTH_FAT_TOKENS")
+
+# Process pool for password hashing (0 hashes inline in the request thread)
+PASSWORD_HASHER_WORKERS = int(os.getenv("PASSWORD_HASHER_WORKERS") or 0)
+# Max hashing jobs waiting for a free process before rejecting with 503
+PASSWORD_HASHER_QUEUE_DEPTH = int(
+    os.getenv("PASSWORD_HASHER_QUEUE_DEPTH") or 32
+)
+# Admission control of the password hashing routes (signup, login, reset
+# password, update), per route and worker: concurrent requests, requests
+# waiting for a slot and seconds they wait before a 503 (0 disables it)
+AUTH_CONCURRENCY_LIMIT = int(os.getenv("AUTH_CONCURRENCY_LIMIT") or 4)
+AUTH_QUEUE_DEPTH = int(os.getenv("AUTH_QUEUE_DEPTH") or 16)
+AUTH_QUEUE_TIMEOUT = float(os.getenv("AUTH_QUEUE_TIMEOUT") or 2)
+
+# Token bucket per client for login and password recovery (0 disables it),
+# RATE_LIMIT_ENABLED=false turns them all off (e.g. load tests from one host)
+RATE_LIMIT_ENABLED = env_flag("RATE_LIMIT_ENABLED", default=True)
+LOGIN_RATE_PER_MINUTE = float(os.getenv("LOGIN_RATE_PER_MINUTE") or 30)
+LOGIN_RATE_BURST = int(os.getenv("LOGIN_RATE_BURST") or 10)
+RECOVERY_RATE_PER_MINUTE = float(os.getenv("RECOVERY_RATE_PER_MINUTE") or 5)
+RECOVERY_RATE_BURST = int(os.getenv("RECOVERY_RATE_BURST") or 3)
+
+# Hashing processes of the `import_users` command
+USER_IMPORT_WORKERS = int(os.getenv("USER_IMPORT_WORKERS") or os.cpu_count() or 1)
+# Hashing processes of the API imports, apart from the auth ones, and the
+# chunks (64 passwords) queued for them before an import waits
+USER_IMPORT_API_WORKERS = int(os.getenv("USER_IMPORT_API_WORKERS") or 1)
+USER_IMPORT_API_QUEUE_DEPTH = int(os.getenv("USER_IMPORT_API_QUEUE_DEPTH") or 2)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -149,12 +258,32 @@ USE_TZ = True
 # Your private api key
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
 
+# Point it to a local fake server in dev and tests
+SENDGRID_API_HOST = os.getenv("SENDGRID_API_HOST") or "https://api.sendgrid.com"
+
+# "sendgrid" (a connection per email) or "http" (pooled keep-alive client)
+EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT") or "sendgrid"
+EMAIL_HTTP_MAX_CONNECTIONS = int(os.getenv("EMAIL_HTTP_MAX_CONNECTIONS") or 10)
+EMAIL_HTTP_TIMEOUT = float(os.getenv("EMAIL_HTTP_TIMEOUT") or 10)
+
+# Email templates, compiled once per process (compiled again when they
+# change on disk with EMAIL_TEMPLATES_RELOAD, the default in debug mode)
+EMAIL_TEMPLATES_DIR = BASE_DIR / "services" / "email" / "templates"
+EMAIL_TEMPLATES_RELOAD = env_flag("EMAIL_TEMPLATES_RELOAD", default=DEBUG)
+
+# Size limit of an email attachment, and encoded attachments kept in memory
+EMAIL_MAX_ATTACHMENT_MB = float(os.getenv("EMAIL_MAX_ATTACHMENT_MB") or 10)
+EMAIL_ATTACHMENT_CACHE_SIZE = int(os.getenv("EMAIL_ATTACHMENT_CACHE_SIZE") or 8)
+
 # The domain from email will be sended
 EMAIL_DOMAIM = os.getenv("EMAIL_DOMAIM")
 
 
 #######################################
-#         Static (no needed)          #
+#       Static (admin panel only)     #
 #######################################
 
 STATIC_URL = "/static/"
+
+# Admin panel assets, served by `app.asgi` after `collectstatic`
+STATIC_ROOT = BASE_DIR / "staticfiles"
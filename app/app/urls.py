@@ -6,7 +6,13 @@ from django.contrib import admin
 from django.urls import path
 
 from fastapi import APIRouter
-from users.urls import router as user_router
+
+from app.settings import ASYNC_ROUTERS
+
+if ASYNC_ROUTERS:
+    from users.async_urls import router as user_router
+else:
+    from users.urls import router as user_router
 
 #######################################
 #         Url for django App          #
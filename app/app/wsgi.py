@@ -26,13 +26,68 @@ application = get_wsgi_application()
 # The principal usage of this schema is access to DjangoORM
 # in the FastAPI process.
 
-from app.urls import api_router
+from app.urls import api_router  # noqa: E402
+from app.settings import (  # noqa: E402
+    METRICS_ENABLED,
+    SERVER_TIMING,
+    DB_REPLICAS,
+    DB_PRIMARY_STICKY_SECONDS,
+)
+from services.responses import FastJSONResponse  # noqa: E402
 
 app = FastAPI(
     title="{{ project_name }}",
     description="TODO...",
     version="1.0.0",
+    default_response_class=FastJSONResponse,
 )
 
 # The api_route instance contain all routers.
 app.include_router(api_router, prefix="/api")
+
+
+#######################################
+#           Read Replicas             #
+#######################################
+
+# The clients that just wrote keep reading from the primary
+
+if DB_REPLICAS:
+    from services.db.routers import ReplicaPinningMiddleware
+
+    app.add_middleware(
+        ReplicaPinningMiddleware, sticky_seconds=DB_PRIMARY_STICKY_SECONDS
+    )
+
+
+#######################################
+#         Performance Metrics         #
+#######################################
+
+# Server-Timing header per request (opt-in, it exposes the timings to the
+# clients) and Prometheus metrics in /metrics (opt-in, serve it on a
+# private network only)
+
+if METRICS_ENABLED or SERVER_TIMING:
+    from services.metrics import TimingMiddleware
+
+    app.add_middleware(TimingMiddleware, server_timing=SERVER_TIMING)
+
+if METRICS_ENABLED:
+    from starlette.responses import PlainTextResponse
+
+    from services.auth.utils import user_cache, token_cache
+    from services.db import db_pool
+    from services.metrics import metrics
+    from users.admission import admission_stats
+
+    metrics.register("user_cache", user_cache.stats)
+    metrics.register("token_cache", token_cache.stats)
+    metrics.register("db_pool", db_pool.stats)
+    metrics.register("admission", admission_stats)
+
+    @app.get("/metrics", include_in_schema=False)
+    def get_metrics() -> PlainTextResponse:
+        return PlainTextResponse(
+            metrics.render(), media_type="text/plain; version=0.0.4"
+        )
@@ -0,0 +1,38 @@
+"""
+Micro benchmarks.
+
+Run them from the `app` directory, e.g. `python -m benchmarks.token_verify`.
+"""
+
+import os
+import time
+from typing import Callable
+
+
+def setup_django() -> None:
+    """Initialize django so the services and the ORM can be imported"""
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    django.setup()
+
+
+def measure(name: str, func: Callable, iterations: int = 10_000) -> float:
+    """
+    Run `func` several times and print its throughput.
+
+    Params:
+    - name: str - The label of the measured case
+    - func: Callable - A function without arguments
+    - iterations: int - How many times func is called
+    Return:
+    - ops: float - Operations per second
+    """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    ops = iterations / elapsed
+    print(f"{name:<32} {ops:>12,.0f} ops/s {elapsed / iterations * 1e6:>10.2f} us/op")
+    return ops
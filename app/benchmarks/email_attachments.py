@@ -0,0 +1,89 @@
+"""
+Peak memory and CPU of building emails that share an attachment.
+
+Builds `--count` messages with the same image, encoding it for every
+message (the previous behavior) and through the shared attachment cache
+(from the file path). Run it from the `app` directory.
+"""
+
+import argparse
+import base64
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import setup_django
+
+setup_django()
+
+from sendgrid.helpers import mail  # noqa: E402
+
+from services.email.sender import EmailSender  # noqa: E402
+
+
+def build_encoding_each_time(path: str, count: int) -> list:
+    messages = []
+    for index in range(count):
+        with open(path, "rb") as file:
+            content = base64.b64encode(file.read()).decode("ascii")
+        message = mail.Mail(
+            from_email="bench@email.com",
+            to_emails=f"user-{index}@email.com",
+            subject="Event",
+            html_content="<h1>Event</h1>",
+        )
+        message.attachment = mail.Attachment(
+            mail.FileContent(content),
+            mail.FileName("event_image.png"),
+            mail.FileType("image/png"),
+            mail.Disposition("attachment"),
+        )
+        messages.append(message)
+    return messages
+
+
+def build_with_cache(path: str, count: int) -> list:
+    sender = EmailSender(transport=object())
+    return [
+        sender.create_email(
+            to_list=[f"user-{index}@email.com"],
+            subject="Event",
+            html_content="<h1>Event</h1>",
+            image=path,
+            content_type="image/png",
+        )
+        for index in range(count)
+    ]
+
+
+def report(name: str, build, path: str, count: int) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    messages = build(path, count)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del messages
+    print(
+        f"{name:<20} {elapsed * 1000:>10.1f} ms {peak / 1024 / 1024:>10.1f} MB peak"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=500)
+    parser.add_argument("--size-kb", type=int, default=512)
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as image:
+        image.write(os.urandom(args.size_kb * 1024))
+    try:
+        report("encode per message", build_encoding_each_time, image.name, args.count)
+        report("shared cache", build_with_cache, image.name, args.count)
+    finally:
+        os.unlink(image.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Per email render cost of the email templates as they grow.
+
+Compares the precompiled and cached `EmailTemplates` with loading and
+compiling the template file for every email, for templates of about
+1KB, 10KB and 100KB. Also renders the real templates in a batch.
+"""
+
+import tempfile
+from pathlib import Path
+
+from benchmarks import setup_django, measure
+
+setup_django()
+
+from django.template import Context, Engine  # noqa: E402
+
+from app.settings import EMAIL_TEMPLATES_DIR  # noqa: E402
+from services.email.rendering import EmailTemplates  # noqa: E402
+
+PARAGRAPH = "<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p>\n"
+
+
+def write_template(directory: Path, name: str, size: int) -> None:
+    body = PARAGRAPH * max(1, size // len(PARAGRAPH))
+    (directory / f"{name}.html").write_text(
+        "<h1>Welcome to app, {{ username }}</h1>\n" + body + "{{ link }}\n"
+    )
+    (directory / f"{name}.txt").write_text("Welcome to app, {{ username }}\n")
+
+
+def main() -> None:
+    context = {"username": "Tiangolo", "link": "https://my-domain.com/reset"}
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        cached = EmailTemplates(directory)
+        engine = Engine(dirs=[tmp])
+        for size in (1_000, 10_000, 100_000):
+            name = f"email_{size}"
+            write_template(directory, name, size)
+
+            def uncached():
+                # Read and compile the files for every email
+                html = engine.from_string((directory / f"{name}.html").read_text())
+                text = engine.from_string((directory / f"{name}.txt").read_text())
+                return html.render(Context(context)), text.render(Context(context))
+
+            assert cached.render(name, context) == uncached()
+            measure(f"{size // 1000}KB compiled per email", uncached, 1_000)
+            measure(f"{size // 1000}KB cached", lambda: cached.render(name, context))
+
+    templates = EmailTemplates(EMAIL_TEMPLATES_DIR)
+    contexts = [{"username": f"user-{i}"} for i in range(100)]
+    measure(
+        "welcome x100 render",
+        lambda: [templates.render("welcome", c) for c in contexts],
+        100,
+    )
+    measure(
+        "welcome x100 render_batch",
+        lambda: templates.render_batch("welcome", contexts),
+        100,
+    )
+
+
+if __name__ == "__main__":
+    main()
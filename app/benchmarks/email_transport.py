@@ -0,0 +1,79 @@
+"""
+Email transports throughput against the local fake SendGrid server.
+
+Reports emails per second and requests per connection for the
+official sendgrid client and the keep-alive async HTTP transport.
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sendgrid.helpers import mail
+
+from benchmarks.fake_sendgrid import start_server
+from services.email.transports import AsyncHTTPTransport, SendGridTransport
+
+
+def build_message(index: int) -> mail.Mail:
+    return mail.Mail(
+        from_email="bench@email.com",
+        to_emails=f"user-{index}@email.com",
+        subject="Benchmark",
+        html_content="<h1>Hello</h1>",
+    )
+
+
+def report(name: str, count: int, elapsed: float, server) -> None:
+    stats = server.RequestHandlerClass.stats.as_dict()
+    print(
+        f"{name:<12} {count / elapsed:>10,.0f} emails/s"
+        f" {stats['requests_per_connection']:>10.1f} requests/connection"
+    )
+
+
+def bench_sendgrid(count: int, concurrency: int, latency: float) -> None:
+    server = start_server(latency=latency)
+    transport = SendGridTransport("fake-key", f"http://127.0.0.1:{server.server_port}")
+    messages = [build_message(i) for i in range(count)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(transport.send, messages))
+    report("sendgrid", count, time.perf_counter() - start, server)
+    server.shutdown()
+
+
+def bench_http(count: int, concurrency: int, latency: float) -> None:
+    server = start_server(latency=latency)
+    transport = AsyncHTTPTransport(
+        "fake-key",
+        f"http://127.0.0.1:{server.server_port}",
+        max_connections=concurrency,
+    )
+    messages = [build_message(i) for i in range(count)]
+
+    async def send_all():
+        await asyncio.gather(*(transport.send_async(m) for m in messages))
+
+    start = time.perf_counter()
+    asyncio.run(send_all())
+    report("http", count, time.perf_counter() - start, server)
+    transport.close()
+    server.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.005)
+    args = parser.parse_args()
+
+    bench_sendgrid(args.count, args.concurrency, args.latency)
+    bench_http(args.count, args.concurrency, args.latency)
+
+
+if __name__ == "__main__":
+    main()
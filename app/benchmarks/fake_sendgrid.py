@@ -0,0 +1,132 @@
+"""
+Local fake of the SendGrid v3 mail API.
+
+Usage: `python -m benchmarks.fake_sendgrid --port 8025` and set
+`SENDGRID_API_HOST=http://localhost:8025` for the API and the workers.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+#######################################
+#          Fake SendGrid API          #
+#######################################
+
+
+class FakeSendGridStats:
+    """Counters shared by all the request handlers"""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.personalizations = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "connections": self.connections,
+                "requests_per_connection": (
+                    self.requests / self.connections if self.connections else 0.0
+                ),
+                "personalizations": self.personalizations,
+                "failures": self.failures,
+            }
+
+
+class FakeSendGridHandler(BaseHTTPRequestHandler):
+    """Accept `POST /v3/mail/send` like SendGrid, with keep-alive"""
+
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    fail_rate = 0.0
+    stats = FakeSendGridStats()
+
+    def setup(self):
+        super().setup()
+        with self.stats._lock:
+            self.stats.connections += 1
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.latency:
+            time.sleep(self.latency)
+
+        if random.random() < self.fail_rate:
+            with self.stats._lock:
+                self.stats.failures += 1
+            return self._reply(500, b'{"errors": [{"message": "fake failure"}]}')
+
+        try:
+            message = json.loads(body or b"{}")
+        except ValueError:
+            return self._reply(400, b'{"errors": [{"message": "invalid json"}]}')
+        with self.stats._lock:
+            self.stats.requests += 1
+            self.stats.personalizations += len(message.get("personalizations", []))
+        self._reply(202, b"")
+
+    def do_GET(self):
+        # Expose the counters, useful for benchmarks
+        self._reply(200, json.dumps(self.stats.as_dict()).encode())
+
+    def _reply(self, status: int, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(
+    port: int = 0, latency: float = 0.0, fail_rate: float = 0.0
+) -> ThreadingHTTPServer:
+    """
+    Start the fake server in a background thread.
+
+    Params:
+    - port: int - Port to listen, 0 picks a free one
+    - latency: float - Seconds to wait before each reply
+    - fail_rate: float - Probability of replying with a 500
+    Return:
+    - server: ThreadingHTTPServer - Use `server.server_port` to get the port
+    """
+    handler = type(
+        "Handler",
+        (FakeSendGridHandler,),
+        {"latency": latency, "fail_rate": fail_rate, "stats": FakeSendGridStats()},
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.latency, args.fail_rate)
+    print(f"Fake SendGrid listening on http://127.0.0.1:{server.server_port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Cold start report of a worker: `import app.wsgi` in a fresh interpreter.
+
+Uses `python -X importtime` and prints the wall time of the cold start
+(median of several runs), the slowest modules and the time per top
+level package.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+STARTUP_CODE = "import app.wsgi"
+
+
+def cold_start(env: Dict[str, str]) -> float:
+    """Seconds to import the app in a new interpreter"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", STARTUP_CODE], env=env, check=True)
+    return time.perf_counter() - start
+
+
+def import_profile(env: Dict[str, str]) -> List[Tuple[str, int, int]]:
+    """
+    Return the (module, self_us, cumulative_us) rows of `-X importtime`.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_CODE],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line.split(":", 1)[1].split("|")
+        rows.append((module.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--save", help="Write the JSON report to this path")
+    args = parser.parse_args()
+
+    env = os.environ.copy()
+    env.setdefault("SECRET_KEY", "import-time-secret-key")
+
+    timings = [cold_start(env) for _ in range(args.runs)]
+    rows = import_profile(env)
+
+    packages = defaultdict(int)
+    for module, self_us, _ in rows:
+        packages[module.split(".")[0]] += self_us
+
+    print(f"Cold start (median of {args.runs}): {statistics.median(timings):.3f}s\n")
+    print(f"{'cumulative ms':>14} {'self ms':>10}  module")
+    for module, self_us, cumulative_us in sorted(rows, key=lambda r: -r[2])[: args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>10.1f}  {module}")
+    print(f"\n{'self ms':>10}  package")
+    top_packages = sorted(packages.items(), key=lambda item: -item[1])[: args.top]
+    for package, self_us in top_packages:
+        print(f"{self_us / 1000:>10.1f}  {package}")
+
+    if args.save:
+        with open(args.save, "w") as output:
+            json.dump(
+                {
+                    "cold_start_seconds": timings,
+                    "packages_self_us": dict(top_packages),
+                    "modules": rows,
+                },
+                output,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
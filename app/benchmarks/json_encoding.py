@@ -0,0 +1,74 @@
+"""
+Per response encoding cost of the API schemas.
+
+What FastAPI does with a returned value and its response_model (validate,
+`jsonable_encoder`, render) with the stdlib `JSONResponse` and with the
+default `FastJSONResponse` (orjson when installed), for `UserDto`,
+`Msg`, `EmailMsg` and a page of `UserPageDto`.
+"""
+
+from benchmarks import setup_django, measure
+
+setup_django()
+
+from django.utils import timezone  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from services import responses  # noqa: E402
+from services.responses import FastJSONResponse, get_json_encoder  # noqa: E402
+from users.shcemas import UserDto, UserPageDto  # noqa: E402
+
+
+def encode(response_class, model, content) -> bytes:
+    validated = model.validate(content)
+    return response_class(jsonable_encoder(validated)).body
+
+
+def main() -> None:
+    now = timezone.now()
+    user = {
+        "id": 1,
+        "email": "tiangolo@email.com",
+        "name": "Tiangolo",
+        "created_at": now,
+        "updated_at": now,
+    }
+    page = {
+        "items": [dict(user, id=i) for i in range(100)],
+        "next_cursor": "MjAyMC0wOS0zMFQwMzowNToxNHwx",
+    }
+    cases = [
+        ("UserDto", UserDto, user),
+        ("Msg", responses.Msg, {"detail": "Password updated successfully"}),
+        ("EmailMsg", responses.EmailMsg, {"detail": "Password recovery email sent"}),
+        ("UserPageDto (100 items)", UserPageDto, page),
+    ]
+    print(f"encoder: {get_json_encoder().__name__}")
+
+    for name, model, content in cases:
+        expected = encode(JSONResponse, model, content)
+        assert encode(FastJSONResponse, model, content) == expected, name
+        # The raw rows (datetimes included) of the users fast path
+        assert FastJSONResponse(content).body == expected, name
+
+        iterations = 1_000 if name.startswith("UserPageDto") else 10_000
+        measure(
+            f"{name} json",
+            lambda: encode(JSONResponse, model, content),
+            iterations,
+        )
+        measure(
+            f"{name} fast",
+            lambda: encode(FastJSONResponse, model, content),
+            iterations,
+        )
+        measure(
+            f"{name} fast (raw)",
+            lambda: FastJSONResponse(content).body,
+            iterations,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+Load benchmark of the users API.
+
+Drives the real FastAPI `app` (in process, or a local uvicorn) through
+signup, login, /current, update and password reset. Emails only reach
+the outbox and, if delivered, a local fake SendGrid server.
+
+The client is httpx, an optional dependency: `poetry install -E http-email`.
+
+Usage (from the `app` dir, SQLite stand-in):
+
+    DB_ENGINE=django.db.backends.sqlite3 POSTGRES_DB=/tmp/bench.sqlite3 \\
+        python -m benchmarks.load --users 200 --concurrency 20 \\
+        --save benchmarks/results/run.json --compare benchmarks/results/base.json
+
+Reports throughput, p50/p95/p99 latency and errors per endpoint.
+`--compare` exits with code 1 when an endpoint regresses more than
+`--threshold` or has more errors than the baseline. All the requests
+come from one address, so the per client rate limits are disabled.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from typing import Callable, Dict, List
+
+from benchmarks import setup_django
+from benchmarks.fake_sendgrid import start_server
+
+
+#######################################
+#             Environment             #
+#######################################
+
+
+class DisableMigrations(dict):
+    """Create the tables straight from the models (`migrate --run-syncdb`)"""
+
+    def __contains__(self, item):
+        return True
+
+    def __getitem__(self, item):
+        return None
+
+
+def prepare_environment(fast_hasher: bool) -> None:
+    """Point the email provider to the fake server and create the tables"""
+    fake_sendgrid = start_server()
+    os.environ["SENDGRID_API_HOST"] = f"http://127.0.0.1:{fake_sendgrid.server_port}"
+    os.environ.setdefault("SENDGRID_API_KEY", "fake-key")
+    os.environ.setdefault("EMAIL_DOMAIM", "bench@email.com")
+    # One client for all the users, it would be throttled after a burst
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    setup_django()
+
+    from django.conf import settings
+    from django.core.management import call_command
+
+    if fast_hasher:
+        # Measure everything but PBKDF2 (in process runs only)
+        settings.PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+    settings.MIGRATION_MODULES = DisableMigrations()
+    call_command("migrate", run_syncdb=True, verbosity=0)
+
+
+#######################################
+#           Load Generator            #
+#######################################
+
+
+def percentile(values: List[float], rank: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(rank / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_phase(
+    name: str, jobs: List[Callable], concurrency: int, results: Dict[str, dict]
+) -> None:
+    """Run the request coroutines of one endpoint with bounded concurrency"""
+    latencies: List[float] = []
+    errors = 0
+    queue = list(reversed(jobs))
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            job = queue.pop()
+            start = time.perf_counter()
+            response = await job()
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    results[name] = {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+    print(
+        f"{name:<10} {results[name]['throughput']:>10.1f} req/s"
+        f"  p50 {results[name]['p50_ms']:>8.2f} ms"
+        f"  p95 {results[name]['p95_ms']:>8.2f} ms"
+        f"  p99 {results[name]['p99_ms']:>8.2f} ms"
+        f"  errors {errors}"
+    )
+
+
+async def run_scenario(client, users: int, concurrency: int, reads: int) -> dict:
+    from services.auth.utils import COOKIE_SESSION_NAME, create_access_token
+
+    run_id = uuid.uuid4().hex[:8]
+    accounts = [
+        {
+            "email": f"bench-{run_id}-{i}@email.com",
+            "name": f"User {i}",
+            "password": "p4ss-w0rd",
+        }
+        for i in range(users)
+    ]
+    sessions: Dict[str, str] = {}
+    ids: Dict[str, int] = {}
+    results: Dict[str, dict] = {}
+
+    def signup(account):
+        async def job():
+            response = await client.post("/api/users/signup", json=account)
+            if response.status_code == 201:
+                ids[account["email"]] = response.json()["id"]
+            return response
+
+        return job
+
+    def login(account):
+        async def job():
+            credentials = {"email": account["email"], "password": account["password"]}
+            response = await client.post("/api/users/login", json=credentials)
+            token = response.cookies.get(COOKIE_SESSION_NAME)
+            if token:
+                sessions[account["email"]] = token
+            return response
+
+        return job
+
+    def current(account):
+        def job():
+            cookies = {COOKIE_SESSION_NAME: sessions.get(account["email"], "")}
+            return client.get("/api/users/current", cookies=cookies)
+
+        return job
+
+    def update(account):
+        def job():
+            cookies = {COOKIE_SESSION_NAME: sessions.get(account["email"], "")}
+            user_id = ids.get(account["email"], 0)
+            body = {"name": account["name"] + " updated"}
+            return client.put(f"/api/users/{user_id}", json=body, cookies=cookies)
+
+        return job
+
+    def reset(account):
+        def job():
+            token = create_access_token(account["email"], recovery_password=True)
+            body = {"token": token, "new_password": account["password"]}
+            return client.post("/api/users/reset-password", json=body)
+
+        return job
+
+    await run_phase("signup", [signup(a) for a in accounts], concurrency, results)
+    await run_phase("login", [login(a) for a in accounts], concurrency, results)
+    await run_phase(
+        "current", [current(a) for a in accounts] * reads, concurrency, results
+    )
+    await run_phase("update", [update(a) for a in accounts], concurrency, results)
+    await run_phase("reset", [reset(a) for a in accounts], concurrency, results)
+    return results
+
+
+#######################################
+#             Run Modes               #
+#######################################
+
+
+async def run_in_process(args) -> dict:
+    import httpx
+    from app.wsgi import app
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        return await run_scenario(client, args.users, args.concurrency, args.reads)
+
+
+async def run_uvicorn(args) -> dict:
+    import httpx
+
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.wsgi:app",
+            "--port",
+            str(args.port),
+            "--log-level",
+            "warning",
+            "--workers",
+            str(args.workers),
+        ],
+        env=os.environ.copy(),
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        async with httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(max_connections=args.concurrency),
+            timeout=30,
+        ) as client:
+            for _ in range(100):
+                try:
+                    await client.get("/docs")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            return await run_scenario(client, args.users, args.concurrency, args.reads)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+#######################################
+#         Results & Regressions       #
+#######################################
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """
+    List the endpoints slower than the baseline by more than threshold,
+    or with more errors than the baseline.
+    """
+    regressions = []
+    for name, current in results["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base:
+            continue
+        if current["errors"] > base.get("errors", 0):
+            regressions.append(
+                f"{name}: errors {current['errors']} > {base.get('errors', 0)}"
+            )
+        if base["throughput"] and current["throughput"] < base["throughput"] * (
+            1 - threshold
+        ):
+            regressions.append(
+                f"{name}: throughput {current['throughput']} < {base['throughput']}"
+            )
+        if base["p95_ms"] and current["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {current['p95_ms']} > {base['p95_ms']} ms")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--reads", type=int, default=5, help="/current per user")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--fast-hasher", action="store_true")
+    parser.add_argument("--save", help="Write the JSON results to this path")
+    parser.add_argument("--compare", help="Baseline JSON results")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    try:
+        import httpx  # noqa: F401
+    except ImportError:
+        parser.error("httpx is required: `poetry install -E http-email`")
+
+    prepare_environment(args.fast_hasher)
+    runner = run_in_process if args.mode == "inprocess" else run_uvicorn
+    endpoints = asyncio.run(runner(args))
+
+    from django.db import connection
+
+    results = {
+        "meta": {
+            "mode": args.mode,
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "reads": args.reads,
+            "workers": args.workers,
+            "fast_hasher": args.fast_hasher,
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "endpoints": endpoints,
+    }
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as output:
+            json.dump(results, output, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
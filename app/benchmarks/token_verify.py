@@ -0,0 +1,34 @@
+"""
+Cached vs uncached JWT verification throughput.
+"""
+
+from benchmarks import setup_django, measure
+
+setup_django()
+
+from jose import jwt  # noqa: E402
+
+from app.settings import SECRET_KEY  # noqa: E402
+from services.auth.utils import (  # noqa: E402
+    create_access_token,
+    token_cache,
+    verify_token,
+)
+
+
+def main() -> None:
+    token = create_access_token("benchmark@email.com")
+
+    measure(
+        "uncached jwt.decode",
+        lambda: jwt.decode(token, SECRET_KEY, algorithms=["HS256"]),
+    )
+
+    token_cache.clear()
+    verify_token(token)
+    measure("cached verify_token", lambda: verify_token(token))
+    print(token_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
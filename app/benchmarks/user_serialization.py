@@ -0,0 +1,67 @@
+"""
+Per response serialization cost of the users endpoints.
+
+Compares the default path (model instance -> `UserDto.from_django` ->
+response_model validation -> `jsonable_encoder` -> `json.dumps`) with the
+fast path of `users.serializers` for the `/signup`, `/login` and
+`/current` responses. No database is needed, rows are built in memory.
+"""
+
+from benchmarks import setup_django, measure
+
+setup_django()
+
+import json  # noqa: E402
+
+from django.utils import timezone  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from users.models import User  # noqa: E402
+from users.shcemas import UserDto  # noqa: E402
+from users.serializers import USER_PUBLIC_FIELDS, render_user  # noqa: E402
+
+
+def default_path(user: User) -> bytes:
+    dto = UserDto.from_django(user)
+    # What FastAPI does with the returned value and the response_model
+    validated = UserDto.validate(dto)
+    return json.dumps(
+        jsonable_encoder(validated),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def main() -> None:
+    now = timezone.now()
+    fields = {
+        "id": 1,
+        "email": "tiangolo@email.com",
+        "name": "Tiangolo",
+        "created_at": now,
+        "updated_at": now,
+    }
+    # The full row a `User.objects.filter(...).first()` hydrates
+    user = User(password="pbkdf2_sha256$216000$salt$hash", **fields)
+    login_row = dict(fields, password=user.password)
+    cached_dto = UserDto.construct(**fields)
+
+    assert default_path(user) == render_user(fields)
+
+    measure("signup default", lambda: default_path(user))
+    measure("signup fast", lambda: render_user(user))
+
+    measure("login default", lambda: default_path(User(**login_row)))
+    measure(
+        "login fast",
+        lambda: render_user({k: login_row[k] for k in USER_PUBLIC_FIELDS}),
+    )
+
+    measure("current default", lambda: default_path(user))
+    measure("current fast", lambda: render_user(cached_dto))
+
+
+if __name__ == "__main__":
+    main()
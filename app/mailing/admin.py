@@ -0,0 +1,33 @@
+"""
+Admin Panel settings for Mailing.
+"""
+
+from django.contrib import admin
+
+from .models import Broadcast, EmailOutbox
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    """Outbox monitoring"""
+
+    list_display = ("kind", "to_email", "status", "attempts", "next_attempt_at")
+    list_filter = ("status", "kind")
+    search_fields = ("to_email",)
+    actions = ["cancel"]
+
+    def cancel(self, request, queryset):
+        """Cancel the selected pending emails"""
+        queryset.filter(status=EmailOutbox.PENDING).update(
+            status=EmailOutbox.CANCELLED
+        )
+
+    cancel.short_description = "Cancel the selected pending emails"
+
+
+@admin.register(Broadcast)
+class BroadcastAdmin(admin.ModelAdmin):
+    """Broadcast monitoring"""
+
+    list_display = ("subject", "status", "sent_count", "created_at", "finished_at")
+    list_filter = ("status",)
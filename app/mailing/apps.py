@@ -0,0 +1,12 @@
+"""
+App config module.
+"""
+
+from django.apps import AppConfig
+
+
+class MailingConfig(AppConfig):
+    """Current app configuration"""
+
+    name = "mailing"
+    verbose_name = "Mailing"
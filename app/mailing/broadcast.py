@@ -0,0 +1,100 @@
+"""
+Broadcast emails to the whole users table.
+"""
+
+import logging
+from typing import Dict, Iterator, List, Tuple
+
+from django.db.models import F
+from django.utils import timezone
+
+from users.models import User
+
+from .models import Broadcast
+
+
+logger = logging.getLogger(__name__)
+
+
+#######################################
+#          Broadcast Sender           #
+#######################################
+
+
+def iter_recipients(
+    after_id: int, chunk_size: int
+) -> Iterator[Tuple[int, str, Dict[str, str]]]:
+    """
+    Stream the active users after a checkpoint.
+
+    `iterator()` uses a server side cursor on PostgreSQL, so only
+    `chunk_size` rows are held in memory.
+
+    Yield:
+    - (id, email, substitutions) - Raw values, the sender escapes them
+      for the HTML part
+    """
+    rows = (
+        User.objects.filter(id__gt=after_id, is_active=True)
+        .order_by("id")
+        .values_list("id", "email", "name")
+        .iterator(chunk_size=chunk_size)
+    )
+    for user_id, email, name in rows:
+        yield user_id, email, {"-name-": name, "-email-": email}
+
+
+def send_broadcast(broadcast: Broadcast, batch_size: int = None) -> Broadcast:
+    """
+    Send (or resume) a broadcast, one provider call per batch.
+
+    The checkpoint is saved after each delivered batch, if the process
+    stops the next run starts from the first undelivered batch.
+
+    Params:
+    - broadcast: Broadcast - The broadcast to send
+    - batch_size: int - Recipients per email, default the provider max
+    Return:
+    - broadcast: Broadcast - The updated broadcast
+    Raises:
+    - EmailTransportError: A batch failed, the checkpoint allows to resume
+    """
+    # Imported here, only the senders need the email provider
+    from services.email import sender
+    from services.email.sender import MAX_PERSONALIZATIONS
+
+    batch_size = min(batch_size or MAX_PERSONALIZATIONS, MAX_PERSONALIZATIONS)
+    if broadcast.status == Broadcast.DONE:
+        return broadcast
+    Broadcast.objects.filter(pk=broadcast.pk).update(status=Broadcast.SENDING)
+
+    batch: List[Tuple[str, Dict[str, str]]] = []
+    last_id = broadcast.last_user_id
+
+    def flush() -> None:
+        message = sender.create_bulk_email(
+            recipients=batch,
+            subject=broadcast.subject,
+            html_content=broadcast.html_content,
+        )
+        sender.deliver(email_to_send=message)
+        Broadcast.objects.filter(pk=broadcast.pk).update(
+            last_user_id=last_id,
+            sent_count=F("sent_count") + len(batch),
+        )
+        logger.info("Broadcast %s sent up to user %s", broadcast.pk, last_id)
+        batch.clear()
+
+    for user_id, email, substitutions in iter_recipients(last_id, batch_size):
+        batch.append((email, substitutions))
+        last_id = user_id
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    Broadcast.objects.filter(pk=broadcast.pk).update(
+        status=Broadcast.DONE, finished_at=timezone.now()
+    )
+    broadcast.refresh_from_db()
+    return broadcast
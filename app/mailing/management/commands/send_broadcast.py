@@ -0,0 +1,45 @@
+"""
+Send an email to all the active users.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mailing.broadcast import send_broadcast
+from mailing.models import Broadcast
+from services.email.transports import EmailTransportError
+
+
+class Command(BaseCommand):
+    help = "Create and send a broadcast, or resume an interrupted one"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--subject", help="The email subject")
+        parser.add_argument(
+            "--html-file",
+            help="HTML content, supports the -name- and -email- tags",
+        )
+        parser.add_argument("--resume", type=int, help="Broadcast ID to resume")
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options["resume"]:
+            broadcast = Broadcast.objects.filter(pk=options["resume"]).first()
+            if not broadcast:
+                raise CommandError("Broadcast not found")
+        else:
+            if not options["subject"] or not options["html_file"]:
+                raise CommandError("--subject and --html-file are required")
+            with open(options["html_file"]) as html_file:
+                broadcast = Broadcast.objects.create(
+                    subject=options["subject"], html_content=html_file.read()
+                )
+            self.stdout.write(f"Broadcast {broadcast.pk} created")
+
+        try:
+            broadcast = send_broadcast(broadcast, batch_size=options["batch_size"])
+        except EmailTransportError as error:
+            raise CommandError(
+                f"Broadcast {broadcast.pk} stopped, resume it with --resume "
+                f"{broadcast.pk}: {error}"
+            )
+        self.stdout.write(f"Broadcast {broadcast.pk} sent to {broadcast.sent_count}")
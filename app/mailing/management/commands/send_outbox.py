@@ -0,0 +1,61 @@
+"""
+Run the email outbox worker.
+"""
+
+from django.core.management.base import BaseCommand
+
+from mailing.outbox import OutboxWorker
+from mailing.scheduler import EmailScheduler
+
+
+class Command(BaseCommand):
+    help = "Deliver the pending emails of the outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--max-attempts", type=int, default=8)
+        parser.add_argument("--backoff", type=float, default=5.0)
+        parser.add_argument("--poll-interval", type=float, default=1.0)
+        parser.add_argument(
+            "--horizon",
+            type=float,
+            default=60.0,
+            help="Seconds ahead of scheduled emails kept in memory",
+        )
+        parser.add_argument("--prefetch", type=int, default=1000)
+        parser.add_argument(
+            "--resync",
+            type=float,
+            default=30.0,
+            help="Max seconds between reloads of the scheduled emails",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when the outbox has no due emails",
+        )
+
+    def handle(self, *args, **options):
+        worker = OutboxWorker(
+            batch_size=options["batch_size"],
+            concurrency=options["concurrency"],
+            max_attempts=options["max_attempts"],
+            backoff=options["backoff"],
+        )
+        self.stdout.write("Outbox worker started")
+        try:
+            if options["once"]:
+                worker.run(once=True)
+            else:
+                # Sleeps until the next due email or a new one (LISTEN on
+                # PostgreSQL, polling every poll interval elsewhere)
+                EmailScheduler(
+                    worker,
+                    horizon=options["horizon"],
+                    prefetch=options["prefetch"],
+                    resync=options["resync"],
+                    poll_interval=options["poll_interval"],
+                ).run()
+        except KeyboardInterrupt:
+            self.stdout.write("Outbox worker stopped")
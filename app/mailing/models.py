@@ -0,0 +1,94 @@
+"""
+Email outbox model.
+"""
+
+from django.db import models
+
+
+#######################################
+#          Outbox DB Model            #
+#######################################
+
+
+class EmailOutbox(models.Model):
+    """
+    An email waiting to be delivered by the outbox worker.
+
+    Rows are written in the same transaction as the change that
+    triggers the email, so an email is never lost nor sent for a
+    change that was rolled back. A deferred email is a row with a
+    `next_attempt_at` in the future (see `mailing.scheduler`).
+    """
+
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (SENT, "Sent"),
+        (FAILED, "Failed"),
+        (CANCELLED, "Cancelled"),
+    ]
+
+    # The email kind, a key of `services.email.EMAIL_BUILDERS`
+    kind = models.CharField(max_length=64)
+    to_email = models.EmailField()
+    payload = models.JSONField(default=dict)
+
+    # Delivery state
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    last_error = models.TextField(blank=True, default="")
+
+    # Metadata
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} -> {self.to_email} ({self.status})"
+
+
+#######################################
+#         Broadcast DB Model          #
+#######################################
+
+
+class Broadcast(models.Model):
+    """
+    An announcement sent to all the active users.
+
+    Recipients are processed in `id` order and `last_user_id` is the
+    checkpoint, so an interrupted broadcast resumes where it stopped.
+    Use substitution tags as "-name-" and "-email-" in the content.
+    """
+
+    PENDING = "pending"
+    SENDING = "sending"
+    DONE = "done"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (SENDING, "Sending"),
+        (DONE, "Done"),
+    ]
+
+    subject = models.CharField(max_length=255)
+    html_content = models.TextField()
+
+    # Delivery state
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    last_user_id = models.BigIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+
+    # Metadata
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.subject} ({self.status})"
@@ -0,0 +1,210 @@
+"""
+Email outbox: enqueue emails and deliver them out of the API process.
+"""
+
+import time
+import logging
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from django.db import close_old_connections, connections, router, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL channel where the new outbox rows are announced
+OUTBOX_CHANNEL = "email_outbox"
+
+
+#######################################
+#            Enqueue Emails           #
+#######################################
+
+
+def enqueue_email(kind: str, to_email: str, **payload) -> EmailOutbox:
+    """
+    Store an email in the outbox.
+
+    Call it inside the transaction of the change that triggers the email.
+
+    Params:
+    - kind: str - The email kind, a key of `services.email.EMAIL_BUILDERS`
+    - to_email: str - The target email
+    - payload: dict - The arguments for the email builder
+    Return:
+    - outbox: EmailOutbox - The stored row
+    """
+    email = EmailOutbox.objects.create(
+        kind=kind,
+        to_email=to_email,
+        payload=payload,
+        next_attempt_at=timezone.now(),
+    )
+    notify_outbox(email)
+    return email
+
+
+def notify_outbox(email: EmailOutbox = None) -> None:
+    """
+    Announce a new outbox row to the schedulers (see `mailing.scheduler`)
+    with a PostgreSQL NOTIFY, delivered only if the transaction commits.
+    Without an email the schedulers reload their timers.
+
+    Params:
+    - email: EmailOutbox - The stored row, None for many rows
+    """
+    connection = connections[router.db_for_write(EmailOutbox)]
+    if connection.vendor != "postgresql":
+        return
+    message = ""
+    if email is not None:
+        message = f"{email.pk} {email.next_attempt_at.timestamp()}"
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [OUTBOX_CHANNEL, message])
+
+
+#######################################
+#            Outbox Worker            #
+#######################################
+
+
+class OutboxWorker:
+    """
+    Drain the outbox, several workers can run at the same time.
+
+    Params:
+    - batch_size: int - Rows claimed per tick
+    - concurrency: int - Emails delivered in parallel
+    - max_attempts: int - Attempts before marking an email as failed
+    - backoff: float - Base seconds of the exponential retry backoff
+    - max_backoff: float - Max seconds between retries
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        concurrency: int = 8,
+        max_attempts: int = 8,
+        backoff: float = 5.0,
+        max_backoff: float = 3600.0,
+    ):
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="outbox"
+        )
+
+    def deliver(self, email: EmailOutbox) -> None:
+        """Build and send one email, raise on failure"""
+        # Imported here, only the worker needs the email provider
+        from services.email import EMAIL_BUILDERS, sender
+
+        message = EMAIL_BUILDERS[email.kind](email=email.to_email, **email.payload)
+        sender.deliver(email_to_send=message)
+
+    def _try_deliver(self, email: EmailOutbox) -> Optional[Exception]:
+        # Any failure is recorded and retried later
+        try:
+            self.deliver(email)
+        except Exception as error:
+            return error
+        return None
+
+    def retry_delay(self, attempts: int) -> timedelta:
+        """Exponential backoff for the given number of failed attempts"""
+        seconds = min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+        return timedelta(seconds=seconds)
+
+    def tick(self) -> int:
+        """
+        Claim a batch of due emails and deliver them.
+
+        Rows are locked with `FOR UPDATE SKIP LOCKED`, so concurrent
+        workers never claim the same email.
+
+        Return:
+        - count: int - The number of processed emails
+        """
+        with transaction.atomic():
+            batch: List[EmailOutbox] = list(
+                self.claim_due().order_by("next_attempt_at")[: self.batch_size]
+            )
+            return self.process(batch)
+
+    def claim_due(self) -> QuerySet:
+        """
+        The due emails not claimed by other workers, to use inside a
+        transaction. Rows are locked with `FOR UPDATE SKIP LOCKED`.
+        """
+        return EmailOutbox.objects.select_for_update(skip_locked=True).filter(
+            status=EmailOutbox.PENDING,
+            next_attempt_at__lte=timezone.now(),
+        )
+
+    def process(self, batch: List[EmailOutbox]) -> int:
+        """
+        Deliver a batch of claimed emails and store the results.
+
+        Params:
+        - batch: List[EmailOutbox] - Rows locked by `claim_due`
+        Return:
+        - count: int - The number of processed emails
+        """
+        if not batch:
+            return 0
+
+        errors = list(self.executor.map(self._try_deliver, batch))
+
+        now = timezone.now()
+        for email, error in zip(batch, errors):
+            email.attempts += 1
+            if error is None:
+                email.status = EmailOutbox.SENT
+                email.sent_at = now
+                email.last_error = ""
+                # The payload is not needed anymore, it may hold personal data
+                email.payload = {}
+            else:
+                logger.warning("Outbox email %s failed: %s", email.pk, error)
+                email.last_error = str(error) or repr(error)
+                if email.attempts >= self.max_attempts:
+                    email.status = EmailOutbox.FAILED
+                else:
+                    email.next_attempt_at = now + self.retry_delay(email.attempts)
+        EmailOutbox.objects.bulk_update(
+            batch,
+            [
+                "status",
+                "attempts",
+                "next_attempt_at",
+                "last_error",
+                "sent_at",
+                "payload",
+            ],
+        )
+        return len(batch)
+
+    def run(self, poll_interval: float = 1.0, once: bool = False) -> None:
+        """
+        Process the outbox until interrupted.
+
+        Params:
+        - poll_interval: float - Seconds to sleep when the outbox is empty
+        - once: bool - Stop when there is nothing left to deliver
+        """
+        while True:
+            close_old_connections()
+            processed = self.tick()
+            if processed:
+                continue
+            if once:
+                return
+            time.sleep(poll_interval)
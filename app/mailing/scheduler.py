@@ -0,0 +1,307 @@
+"""
+Deferred emails: schedule, cancel and deliver them on time.
+
+A deferred email is an outbox row with `next_attempt_at` in the future,
+so it survives restarts. The scheduler keeps an in-memory heap with the
+emails due in the next `horizon` seconds, loaded at start with one
+indexed range query, and sleeps until the first one is due. New rows are
+pushed to the heap when they are announced (PostgreSQL LISTEN/NOTIFY,
+see `mailing.outbox.notify_outbox`), the heap is only reloaded every
+`resync` seconds (to move the horizon ahead and recover any missed
+notification) or when a bulk insert asks for it.
+"""
+
+import heapq
+import logging
+import select
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, List, Tuple
+
+from django.db import close_old_connections, connections, router, transaction
+from django.utils import timezone
+
+from .models import EmailOutbox
+from .outbox import OUTBOX_CHANNEL, OutboxWorker, notify_outbox
+
+
+logger = logging.getLogger(__name__)
+
+
+#######################################
+#           Schedule Emails           #
+#######################################
+
+
+def schedule_email(
+    kind: str, to_email: str, send_at: datetime, **payload
+) -> EmailOutbox:
+    """
+    Store an email to be delivered at `send_at`.
+
+    Params:
+    - kind: str - The email kind, a key of `services.email.EMAIL_BUILDERS`
+    - to_email: str - The target email
+    - send_at: datetime - When the email must be delivered (aware datetime)
+    - payload: dict - The arguments for the email builder
+    Return:
+    - outbox: EmailOutbox - The stored row, its id allows to cancel it
+    """
+    email = EmailOutbox.objects.create(
+        kind=kind,
+        to_email=to_email,
+        payload=payload,
+        next_attempt_at=send_at,
+    )
+    notify_outbox(email)
+    return email
+
+
+def schedule_emails(
+    jobs: Iterable[Tuple[str, str, datetime, dict]], batch_size: int = 1000
+) -> int:
+    """
+    Store many deferred emails with bulk inserts (e.g. a reminder sequence).
+
+    Params:
+    - jobs: Iterable[Tuple] - (kind, to_email, send_at, payload) tuples
+    - batch_size: int - Rows per INSERT
+    Return:
+    - count: int - The number of scheduled emails
+    """
+    rows = [
+        EmailOutbox(
+            kind=kind, to_email=to_email, payload=payload, next_attempt_at=send_at
+        )
+        for kind, to_email, send_at, payload in jobs
+    ]
+    EmailOutbox.objects.bulk_create(rows, batch_size=batch_size)
+    if rows:
+        # A single notification, the schedulers reload their timers
+        notify_outbox()
+    return len(rows)
+
+
+def cancel_emails(*ids: int, kind: str = None, to_email: str = None) -> int:
+    """
+    Cancel pending emails by id, or all the pending ones of a kind and/or
+    recipient. Already sent emails are not affected.
+
+    Return:
+    - count: int - The number of cancelled emails
+    """
+    if not (ids or kind or to_email):
+        return 0
+    emails = EmailOutbox.objects.filter(status=EmailOutbox.PENDING)
+    if ids:
+        emails = emails.filter(pk__in=ids)
+    if kind:
+        emails = emails.filter(kind=kind)
+    if to_email:
+        emails = emails.filter(to_email=to_email)
+    return emails.update(status=EmailOutbox.CANCELLED)
+
+
+#######################################
+#           Email Scheduler           #
+#######################################
+
+
+class EmailScheduler:
+    """
+    Timer driven outbox delivery.
+
+    Params:
+    - worker: OutboxWorker - Claims and delivers the emails
+    - horizon: float - Seconds ahead loaded in the timers heap
+    - prefetch: int - Max timers loaded per reload
+    - resync: float - Max seconds between reloads of the heap
+    - poll_interval: float - Seconds between reloads without notifications
+      (databases other than PostgreSQL), it bounds the delay of the
+      emails enqueued by other processes
+    """
+
+    def __init__(
+        self,
+        worker: OutboxWorker,
+        horizon: float = 60.0,
+        prefetch: int = 1000,
+        resync: float = 30.0,
+        poll_interval: float = 1.0,
+    ):
+        self.worker = worker
+        self.horizon = horizon
+        self.prefetch = prefetch
+        self.resync = resync
+        self.poll_interval = poll_interval
+        self._timers: List[Tuple[float, int]] = []
+        self._refilled_at = 0.0
+        # Timestamp up to which the heap holds all the pending emails
+        self._loaded_until = 0.0
+        self._resync_requested = False
+        self._listener = None
+
+    def refill(self) -> int:
+        """
+        Load the timers of the emails due before the horizon, a single
+        query over the (status, next_attempt_at) index.
+
+        Return:
+        - count: int - The number of loaded timers
+        """
+        until = timezone.now() + timedelta(seconds=self.horizon)
+        rows = (
+            EmailOutbox.objects.filter(
+                status=EmailOutbox.PENDING, next_attempt_at__lte=until
+            )
+            .order_by("next_attempt_at")
+            .values_list("next_attempt_at", "id")[: self.prefetch]
+        )
+        # Sorted rows are already a valid heap
+        self._timers = [(due.timestamp(), pk) for due, pk in rows]
+        self._loaded_until = until.timestamp()
+        if len(self._timers) >= self.prefetch:
+            # Truncated, the rows after the last one were not loaded
+            self._loaded_until = self._timers[-1][0]
+        self._refilled_at = time.monotonic()
+        self._resync_requested = False
+        return len(self._timers)
+
+    def push(self, pk: int, due: float) -> None:
+        """Add the timer of a new email, if it falls in the loaded window"""
+        if due <= self._loaded_until:
+            heapq.heappush(self._timers, (due, pk))
+
+    def _needs_refill(self) -> bool:
+        interval = self.resync if self._listener is not None else self.poll_interval
+        # Reload when the loaded window is over and all its timers are done
+        window_done = not self._timers and time.time() >= self._loaded_until
+        return (
+            self._resync_requested
+            or window_done
+            or time.monotonic() - self._refilled_at >= interval
+        )
+
+    def _pop_due(self) -> List[int]:
+        now = time.time()
+        due = []
+        while (
+            self._timers
+            and self._timers[0][0] <= now
+            and len(due) < self.worker.batch_size
+        ):
+            due.append(heapq.heappop(self._timers)[1])
+        return due
+
+    def tick(self) -> int:
+        """
+        Claim and deliver the emails with an expired timer, one query by
+        primary key. Cancelled or already sent emails (and duplicated
+        timers) are skipped there.
+
+        Return:
+        - count: int - The number of processed emails
+        """
+        due = self._pop_due()
+        if not due:
+            return 0
+        with transaction.atomic():
+            batch = list(self.worker.claim_due().filter(pk__in=due))
+            processed = self.worker.process(batch)
+
+        # Retries inside the horizon get a timer again
+        for email in batch:
+            if email.status == EmailOutbox.PENDING:
+                self.push(email.pk, email.next_attempt_at.timestamp())
+        return processed
+
+    def seconds_to_next(self) -> float:
+        """Time to sleep until the next timer or the next reload"""
+        interval = self.resync if self._listener is not None else self.poll_interval
+        wait = min(
+            interval - (time.monotonic() - self._refilled_at),
+            self._loaded_until - time.time(),
+        )
+        if self._timers:
+            wait = min(wait, self._timers[0][0] - time.time())
+        return max(0.0, wait)
+
+    #######################################
+    #            Notifications            #
+    #######################################
+
+    def listen(self) -> bool:
+        """
+        Open a dedicated connection subscribed to the outbox channel,
+        only on PostgreSQL.
+
+        Return:
+        - listening: bool - False if the notifications are not available
+        """
+        connection = connections[router.db_for_write(EmailOutbox)]
+        if connection.vendor != "postgresql":
+            return False
+        try:
+            listener = connection.get_new_connection(
+                connection.get_connection_params()
+            )
+            listener.autocommit = True
+            with listener.cursor() as cursor:
+                cursor.execute(f"LISTEN {OUTBOX_CHANNEL}")
+        except Exception as error:
+            logger.warning("Outbox LISTEN failed, polling: %s", error)
+            return False
+        self._listener = listener
+        return True
+
+    def _close_listener(self) -> None:
+        try:
+            self._listener.close()
+        except Exception:
+            pass
+        self._listener = None
+
+    def wait(self, timeout: float) -> None:
+        """Sleep until the timeout or a notification"""
+        if self._listener is None:
+            time.sleep(timeout)
+            return
+        try:
+            readable, _, _ = select.select([self._listener], [], [], timeout)
+            if not readable:
+                return
+            self._listener.poll()
+            notifies, self._listener.notifies = self._listener.notifies, []
+        except Exception as error:
+            # Lost connection, poll until the next reload subscribes again
+            logger.warning("Outbox listener failed: %s", error)
+            self._close_listener()
+            self._resync_requested = True
+            return
+        for notify in notifies:
+            self._on_notify(notify.payload)
+
+    def _on_notify(self, payload: str) -> None:
+        try:
+            pk, due = payload.split()
+            self.push(int(pk), float(due))
+        except ValueError:
+            # A bulk insert (or an unknown message), reload everything
+            self._resync_requested = True
+
+    def run(self) -> None:
+        """Deliver the emails on time until interrupted"""
+        try:
+            while True:
+                close_old_connections()
+                if self._needs_refill():
+                    if self._listener is None:
+                        # Subscribe before the reload, nothing is missed
+                        self.listen()
+                    self.refill()
+                if self.tick():
+                    continue
+                self.wait(self.seconds_to_next())
+        finally:
+            if self._listener is not None:
+                self._close_listener()
@@ -0,0 +1,164 @@
+"""
+Admission control helpers.
+
+FastAPI dependencies that reject excess load fast (503 / 429 with a
+`Retry-After` header) instead of queueing it without bound. The state
+is per worker process, like the caches.
+"""
+
+import math
+import time
+import asyncio
+from collections import OrderedDict
+
+from fastapi import Request
+
+from services.responses import raise_http_exception
+
+
+#######################################
+#         Concurrency Limiter         #
+#######################################
+
+
+class ConcurrencyLimiter:
+    """
+    Allow `limit` concurrent requests on a route and up to `queue_depth`
+    more waiting for a slot (at most `timeout` seconds), reject the rest.
+
+    Use it as a route dependency, the slot is held until the response is
+    sent, so sync handlers running in the threadpool are limited too.
+    """
+
+    def __init__(self, name: str, limit: int, queue_depth: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self.retry_after = max(1, math.ceil(timeout))
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+        self.timeouts = 0
+        self._semaphore = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created on first use, inside the worker event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        return self._semaphore
+
+    def _reject(self) -> None:
+        raise_http_exception.service_unavailable(
+            "Server busy, try again later", retry_after=self.retry_after
+        )
+
+    async def __call__(self):
+        if self.limit <= 0:
+            yield
+            return
+
+        semaphore = self._get_semaphore()
+        if semaphore.locked():
+            if self.waiting >= self.queue_depth:
+                self.shed += 1
+                self._reject()
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self._reject()
+            finally:
+                self.waiting -= 1
+        else:
+            await semaphore.acquire()
+
+        self.active += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            semaphore.release()
+
+    def stats(self) -> dict:
+        """Return the limiter counters"""
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "timeouts": self.timeouts,
+        }
+
+
+#######################################
+#         Token Bucket Limiter        #
+#######################################
+
+
+class RateLimiter:
+    """
+    Token bucket per client: `burst` requests at once, refilled at
+    `per_minute` requests per minute. Over the limit it raises a 429.
+
+    The client is the peer address, run uvicorn with `--proxy-headers`
+    behind a trusted proxy so it is taken from `X-Forwarded-For`. Only
+    the `max_clients` most recent clients are tracked.
+    """
+
+    def __init__(
+        self, name: str, per_minute: float, burst: int, max_clients: int = 10000
+    ):
+        self.name = name
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.max_clients = max_clients
+        self.allowed = 0
+        self.limited = 0
+        self._buckets = OrderedDict()
+
+    def take(self, key: str) -> float:
+        """
+        Take a token from the client bucket.
+
+        Params:
+        - key: str - The client identifier
+        Return:
+        - wait: float - Seconds until a token is available, 0 if taken
+        """
+        now = time.monotonic()
+        tokens, last = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+    async def __call__(self, request: Request) -> None:
+        if self.rate <= 0:
+            return
+        client = request.client.host if request.client else "unknown"
+        wait = self.take(client)
+        if wait:
+            self.limited += 1
+            raise_http_exception.too_many_requests(
+                "Too many requests, try again later", retry_after=math.ceil(wait)
+            )
+        self.allowed += 1
+
+    def stats(self) -> dict:
+        """Return the limiter counters"""
+        return {
+            "clients": len(self._buckets),
+            "allowed": self.allowed,
+            "limited": self.limited,
+        }
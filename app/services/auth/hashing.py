@@ -0,0 +1,184 @@
+"""
+Password hashing executor.
+"""
+
+import os
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List
+
+import django
+from django.contrib.auth import hashers
+
+from app.settings import (
+    PASSWORD_HASHER_WORKERS,
+    PASSWORD_HASHER_QUEUE_DEPTH,
+    USER_IMPORT_API_WORKERS,
+    USER_IMPORT_API_QUEUE_DEPTH,
+)
+from services.metrics import timed
+from services.responses import raise_http_exception
+
+
+#######################################
+#       Process Pool Entrypoints      #
+#######################################
+
+# Hashers are CPU bound (PBKDF2) and hold the GIL, running them
+# in other processes keeps the request threads responsive.
+
+
+def _init_worker() -> None:
+    """Configure django in each pool process"""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+    django.setup()
+
+
+def _make_password(password: str) -> str:
+    return hashers.make_password(password)
+
+
+def _make_passwords(passwords: List[str]) -> List[str]:
+    return [hashers.make_password(password) for password in passwords]
+
+
+def _check_password(password: str, encoded: str) -> bool:
+    return hashers.check_password(password, encoded)
+
+
+#######################################
+#          Password Hasher            #
+#######################################
+
+
+class PasswordHasher:
+    """
+    Run the password hashing in a bounded process pool.
+
+    When `workers` is 0 the hashing is done inline.
+    """
+
+    def __init__(self, workers: int = 0, queue_depth: int = 32):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._pool = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Created lazily so importing the module does not spawn processes
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                    )
+        return self._pool
+
+    def _run(self, func, *args):
+        if not self.enabled:
+            with timed("hash"):
+                return func(*args)
+        if not self._slots.acquire(blocking=False):
+            raise_http_exception.service_unavailable("Server busy, try again later")
+        try:
+            with timed("hash"):
+                return self._get_pool().submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def make_password(self, password: str) -> str:
+        """
+        Hash a raw password.
+
+        Params:
+        - password: str - The raw password
+        Return:
+        - encoded: str - The hashed password ready to store
+        """
+        return self._run(_make_password, password)
+
+    def check_password(self, password: str, encoded: str) -> bool:
+        """
+        Check a raw password against a hashed one.
+
+        Params:
+        - password: str - The raw password
+        - encoded: str - The stored hashed password
+        Return:
+        - valid: bool - True if the password matches
+        """
+        return self._run(_check_password, password, encoded)
+
+    def submit_passwords(
+        self, passwords: List[str], chunk_size: int = 64
+    ) -> List[Future]:
+        """
+        Start hashing many passwords, for bulk jobs.
+
+        At most `workers + queue_depth` chunks are in the pool, the call
+        blocks until a chunk finishes instead of rejecting the job.
+
+        Params:
+        - passwords: List[str] - The raw passwords
+        - chunk_size: int - Passwords per pool task
+        Return:
+        - futures: List[Future] - One future per chunk, each with a list
+          of hashed passwords in the same order
+        """
+        chunks = [
+            passwords[i : i + chunk_size] for i in range(0, len(passwords), chunk_size)
+        ]
+        futures = []
+        if not self.enabled:
+            for chunk in chunks:
+                future = Future()
+                future.set_result(_make_passwords(chunk))
+                futures.append(future)
+            return futures
+        for chunk in chunks:
+            self._slots.acquire()
+            try:
+                future = self._get_pool().submit(_make_passwords, chunk)
+            except BaseException:
+                self._slots.release()
+                raise
+            future.add_done_callback(lambda _: self._slots.release())
+            futures.append(future)
+        return futures
+
+    def shutdown(self) -> None:
+        """Stop the pool processes"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+password_hasher = PasswordHasher(
+    workers=PASSWORD_HASHER_WORKERS,
+    queue_depth=PASSWORD_HASHER_QUEUE_DEPTH,
+)
+
+# The API bulk imports have their own pool, a large file never delays
+# the hashing of the logins and signups
+import_hasher = PasswordHasher(
+    workers=USER_IMPORT_API_WORKERS,
+    queue_depth=USER_IMPORT_API_QUEUE_DEPTH,
+)
+
+
+def _reset_after_fork() -> None:
+    # The pool processes belong to the parent, a forked worker creates its own
+    for hasher in (password_hasher, import_hasher):
+        hasher._pool = None
+        hasher._lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
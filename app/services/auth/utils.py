@@ -2,15 +2,28 @@
 Auth and security helpers
 """
 
+import time
+import hashlib
 from datetime import datetime, timedelta
+from typing import Optional, Tuple
 
 from fastapi import Depends
 from fastapi.security.api_key import APIKeyCookie
-from jose import jwt, JWTError
 
-from app.settings import SECRET_KEY
+from app.settings import (
+    SECRET_KEY,
+    AUTH_FAT_TOKENS,
+    USER_CACHE_SIZE,
+    USER_CACHE_TTL,
+    TOKEN_CACHE_SIZE,
+)
+from services.cache import TTLCache
+from services.db import db_connection, run_in_db
+from services.db.routers import primary_pinned
+from services.metrics import timed
 from services.responses import raise_http_exception
 from users.shcemas import User, UserDto
+from users.serializers import USER_PUBLIC_FIELDS
 
 
 #######################################
@@ -20,23 +33,45 @@ from users.shcemas import User, UserDto
 COOKIE_SESSION_NAME = "oreo_session_key" # You can change it and keep secret
 auth_schema = APIKeyCookie(name=COOKIE_SESSION_NAME)
 
+# Authenticated users by email, avoid a DB lookup per request.
+# Must be invalidated on every write over the user.
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+# Verified JWT payloads by token digest, each one lives until its `exp`.
+token_cache = TTLCache(
+    maxsize=TOKEN_CACHE_SIZE, ttl=timedelta(days=15).total_seconds()
+)
+
 
 #######################################
 #       Auth & Seciruty Helpers       #
 #######################################
 
 
-def create_access_token(email: str, recovery_password: bool = False) -> str:
+def _jose():
+    """
+    python-jose (and its crypto backends) is slow to import, it is
+    loaded on the first token operation instead of at worker startup.
+    """
+    import jose.jwt
+
+    return jose
+
+
+def create_access_token(
+    email: str, recovery_password: bool = False, claims: Optional[dict] = None
+) -> str:
     """
     Create a encoded JWT.
 
     Params:
     - email: str - The user email
     - recovery_password: bool - Indicate if the token must have a short expiration time
+    - claims: dict - Extra payload claims
     Return:
     - token: str - A encoded JWT
     """
-    to_encode = {"email": email}
+    to_encode = {"email": email, **(claims or {})}
     expire_time = timedelta(days=15)
 
     if recovery_password:
@@ -44,7 +79,30 @@ def create_access_token(email: str, recovery_password: bool = False) -> str:
 
     expires_in = datetime.utcnow() + expire_time
     to_encode.update({"exp": expires_in})
-    return jwt.encode(to_encode, SECRET_KEY)
+    with timed("jwt"):
+        return _jose().jwt.encode(to_encode, SECRET_KEY)
+
+
+def create_session_token(user: dict) -> str:
+    """
+    Create the session JWT of a user, with the public user claims in
+    fat tokens mode (`AUTH_FAT_TOKENS`).
+
+    Params:
+    - user: dict - The public user fields (and `token_version`)
+    Return:
+    - token: str - A encoded JWT
+    """
+    claims = None
+    if AUTH_FAT_TOKENS:
+        claims = {
+            "uid": user["id"],
+            "name": user["name"],
+            "created_at": user["created_at"].isoformat(),
+            "updated_at": user["updated_at"].isoformat(),
+            "ver": user.get("token_version", 0),
+        }
+    return create_access_token(user["email"], claims=claims)
 
 
 def get_from_verify_token(token: str) -> str:
@@ -56,12 +114,61 @@ def get_from_verify_token(token: str) -> str:
     Returns:
     - email: str - The email withn the JWT payload
     """
+    return get_verified_payload(token)["email"]
+
+
+def get_verified_payload(token: str) -> dict:
+    """
+    Verify a encoded token and return its payload, raise a 401 if invalid.
+
+    Params:
+    - token: str - The encoded JWT
+    Returns:
+    - payload: dict - The JWT payload, with the email at least
+    """
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        email = payload["email"]
-    except (JWTError, KeyError):
+        payload = verify_token(token)
+    except _jose().JWTError:
+        raise_http_exception.unauthorized()
+    if "email" not in payload:
         raise_http_exception.unauthorized()
-    return email
+    return payload
+
+
+def _user_from_claims(payload: dict) -> UserDto:
+    """Build the user of a fat token, no DB lookup"""
+    return UserDto.construct(
+        id=payload["uid"],
+        email=payload["email"],
+        name=payload["name"],
+        created_at=datetime.fromisoformat(payload["created_at"]),
+        updated_at=datetime.fromisoformat(payload["updated_at"]),
+    )
+
+
+def verify_token(token: str) -> dict:
+    """
+    Decode and verify a JWT, memoizing the payload until it expires.
+
+    Params:
+    - token: str - The encoded JWT
+    Returns:
+    - payload: dict - The decoded JWT payload
+    Raises:
+    - JWTError: If the token is invalid or expired
+    """
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(digest)
+    # Double check the expiration, the cache clock is monotonic
+    if payload is not None and payload["exp"] > time.time():
+        return payload
+
+    with timed("jwt"):
+        payload = _jose().jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    expires_in = payload.get("exp")
+    if isinstance(expires_in, (int, float)):
+        token_cache.set(digest, payload, ttl=expires_in - time.time())
+    return payload
 
 
 def get_auth_user(token: str = Depends(auth_schema)) -> UserDto:
@@ -74,8 +181,152 @@ def get_auth_user(token: str = Depends(auth_schema)) -> UserDto:
     Rturn:
     - user: UserDto - The user info
     """
-    email = get_from_verify_token(token)
-    user = User.objects.filter(email=email).first()
+    payload = get_verified_payload(token)
+    if "uid" in payload:
+        return _user_from_claims(payload)
+    email = payload["email"]
+    user_dto = _get_cached_user(email)
+    if user_dto is not None:
+        return user_dto
+    return _find_auth_user(email)
+
+
+async def get_auth_user_async(token: str = Depends(auth_schema)) -> UserDto:
+    """
+    Async version of `get_auth_user`, the DB lookup (only on cache miss)
+    runs in the DB connection pool.
+
+    Params:
+    - token: str - The encode JWT in cookie request
+    Rturn:
+    - user: UserDto - The user info
+    """
+    payload = get_verified_payload(token)
+    if "uid" in payload:
+        return _user_from_claims(payload)
+    email = payload["email"]
+    user_dto = _get_cached_user(email)
+    if user_dto is not None:
+        return user_dto
+    return await run_in_db(_find_auth_user, email)
+
+
+def _get_cached_user(email: str) -> UserDto:
+    """
+    The cached user, unless the client has just written: the cache may
+    hold a user loaded from a lagging replica.
+    """
+    if primary_pinned():
+        return None
+    return user_cache.get(email)
+
+
+@db_connection
+def _find_auth_user(email: str) -> UserDto:
+    """Load the user from DB and keep it in the users cache"""
+    # Only the public columns, no full model hydration
+    user = User.objects.filter(email=email).values(*USER_PUBLIC_FIELDS).first()
     if not user:
         raise_http_exception.unauthorized()
-    return UserDto.from_django(user)
+    user_dto = UserDto.construct(**user)
+    user_cache.set(email, user_dto)
+    return user_dto
+
+
+def get_auth_user_for_write(token: str = Depends(auth_schema)) -> UserDto:
+    """
+    Same as `get_auth_user`, for the write operations: a fat token is
+    rejected if it was revoked (the user token version has changed).
+
+    Params:
+    - token: str - The encode JWT in cookie request
+    Rturn:
+    - user: UserDto - The user info
+    """
+    user = get_auth_user(token)
+    payload = get_verified_payload(token)
+    if "uid" in payload and not _is_token_current(payload["uid"], payload["ver"]):
+        raise_http_exception.unauthorized()
+    return user
+
+
+async def get_auth_user_for_write_async(
+    token: str = Depends(auth_schema),
+) -> UserDto:
+    """
+    Async version of `get_auth_user_for_write`.
+    """
+    user = await get_auth_user_async(token)
+    payload = get_verified_payload(token)
+    if "uid" in payload and not await run_in_db(
+        _is_token_current, payload["uid"], payload["ver"]
+    ):
+        raise_http_exception.unauthorized()
+    return user
+
+
+@db_connection
+def _is_token_current(user_id: int, token_version: int) -> bool:
+    """Revocation check, a single indexed lookup of the token version"""
+    return User.objects.filter(
+        id=user_id, token_version=token_version, is_active=True
+    ).exists()
+
+
+def get_admin_user(token: str = Depends(auth_schema)) -> UserDto:
+    """
+    Same as `get_auth_user_for_write` but only staff users are allowed,
+    a revoked fat token is rejected.
+
+    Params:
+    - token: str - The encode JWT in cookie request
+    Rturn:
+    - user: UserDto - The user info
+    """
+    user = get_auth_user(token)
+    _check_admin(_get_staff_access(user.id), get_verified_payload(token))
+    return user
+
+
+async def get_admin_user_async(token: str = Depends(auth_schema)) -> UserDto:
+    """
+    Async version of `get_admin_user`.
+    """
+    user = await get_auth_user_async(token)
+    access = await run_in_db(_get_staff_access, user.id)
+    _check_admin(access, get_verified_payload(token))
+    return user
+
+
+@db_connection
+def _get_staff_access(user_id: int) -> Optional[Tuple[bool, int]]:
+    """
+    The staff flag (not part of the cached UserDto) and the token version
+    of an active user, a single indexed lookup.
+    """
+    return (
+        User.objects.filter(id=user_id, is_active=True)
+        .values_list("is_staff", "token_version")
+        .first()
+    )
+
+
+def _check_admin(access: Optional[Tuple[bool, int]], payload: dict) -> None:
+    """Raise a 401 for a revoked token and a 403 for a non staff user"""
+    if access is None:
+        raise_http_exception.unauthorized()
+    is_staff, token_version = access
+    if "uid" in payload and payload["ver"] != token_version:
+        raise_http_exception.unauthorized()
+    if not is_staff:
+        raise_http_exception.forbidden("Forbidden")
+
+
+def invalidate_auth_user(*emails: str) -> None:
+    """
+    Remove the users from the authenticated users cache.
+
+    Params:
+    - emails: str - The emails of the modified users
+    """
+    user_cache.invalidate(*emails)
@@ -0,0 +1,101 @@
+"""
+In-process caching helpers.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+#######################################
+#          TTL + LRU Cache            #
+#######################################
+
+
+class TTLCache:
+    """
+    A bounded, thread safe, per-process cache.
+
+    Entries expire after `ttl` seconds and, when the cache is full,
+    the least recently used entry is evicted.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """The cache is disabled when the size or the ttl are zero"""
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Return the cached value or None if it is missing or expired.
+
+        Params:
+        - key: Hashable - The entry key
+        Return:
+        - value: Any - The cached value or None
+        """
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float = None) -> None:
+        """
+        Store a value, evicting the least recently used entry if full.
+
+        Params:
+        - key: Hashable - The entry key
+        - value: Any - The value to store
+        - ttl: float - Optional custom time to live in seconds
+        """
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys: Hashable) -> None:
+        """Remove the given keys from the cache if present"""
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all the entries"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """Return the cache counters, useful to size the cache"""
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
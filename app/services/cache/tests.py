@@ -0,0 +1,67 @@
+"""
+Cache tests, run them with `python manage.py test services.cache`.
+"""
+
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from . import TTLCache
+
+
+#######################################
+#          TTL + LRU Cache            #
+#######################################
+
+
+class TTLCacheTests(SimpleTestCase):
+    def setUp(self):
+        # A fake monotonic clock, moved forward by the tests
+        self.now = 1000.0
+        patcher = mock.patch("services.cache.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = TTLCache(maxsize=2, ttl=10)
+
+    def test_entry_is_returned_before_its_ttl(self):
+        self.cache.set("a", 1)
+        self.now += 9.9
+
+        self.assertEqual(self.cache.get("a"), 1)
+
+    def test_expired_entry_is_a_miss(self):
+        self.cache.set("a", 1)
+        self.now += 10
+
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.stats()["misses"], 1)
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+    def test_lru_touch_does_not_extend_the_ttl(self):
+        self.cache.set("a", 1)
+        self.now += 5
+        # Touched, it becomes the most recently used entry
+        self.assertEqual(self.cache.get("a"), 1)
+        self.cache.set("b", 2)
+        self.now += 5
+
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.get("b"), 2)
+
+    def test_touched_entry_survives_eviction_until_it_expires(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")
+        self.cache.set("c", 3)
+
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), 1)
+        self.now += 10
+        self.assertIsNone(self.cache.get("a"))
+
+    def test_custom_ttl_expires(self):
+        # e.g. a token memoized until its `exp`
+        self.cache.set("a", 1, ttl=2)
+        self.now += 2
+
+        self.assertIsNone(self.cache.get("a"))
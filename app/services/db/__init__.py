@@ -0,0 +1,231 @@
+"""
+Database connection management for the FastAPI process.
+
+Django only closes stale connections through the `request_started` and
+`request_finished` signals, which never fire for FastAPI routes. Also the
+connections are thread local and FastAPI may run a request in several
+threads. So every ORM unit of work runs in the threads of a bounded pool,
+where the connections are persistent, health checked and recycled.
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable
+
+from django.db import close_old_connections, connections
+
+from app.settings import (
+    DB_MAX_CONNECTIONS,
+    DB_POOL_TIMEOUT,
+    DB_HEALTH_CHECKS,
+    DB_HEALTH_CHECK_INTERVAL,
+)
+from services.metrics import current_timings, db_query_timer
+from services.responses import raise_http_exception
+
+
+#######################################
+#          Connection Pool            #
+#######################################
+
+
+class ConnectionPool:
+    """
+    A fixed set of threads, each one owning its own DB connection.
+
+    Params:
+    - size: int - Max number of DB connections (and threads)
+    - timeout: float - Max seconds to wait for a free connection
+    - health_checks: bool - Ping reused connections before using them
+    - health_check_interval: float - Idle seconds before a connection is
+      pinged again, a busy connection is not pinged on every use
+    """
+
+    def __init__(
+        self,
+        size: int,
+        timeout: float,
+        health_checks: bool = True,
+        health_check_interval: float = 30.0,
+    ):
+        self.size = size
+        self.timeout = timeout
+        self.health_checks = health_checks
+        self.health_check_interval = health_check_interval
+        self._setup()
+
+    def _setup(self) -> None:
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.size,
+            thread_name_prefix="db",
+        )
+        self.in_use = 0
+        self.waiting = 0
+        self.served = 0
+        self.timeouts = 0
+        self.discarded = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def reset_after_fork(self) -> None:
+        """
+        Threads and connections are not inherited by a forked process,
+        start from a clean pool and never reuse the parent connections.
+        """
+        for conn in connections.all():
+            # Drop the socket without sending a terminate to the server,
+            # it still belongs to the parent process.
+            conn.connection = None
+        self._setup()
+
+    def _prepare_connections(self) -> None:
+        """
+        Drop obsolete connections and the idle ones that fail the health
+        check. A connection that raised an error is already checked by
+        `close_old_connections` at the end of the previous operation.
+        """
+        close_old_connections()
+        if not self.health_checks:
+            return
+        # Per thread, when each connection finished its last operation
+        released_at = getattr(self._local, "released_at", {})
+        now = time.monotonic()
+        for conn in connections.all():
+            if conn.connection is None:
+                continue
+            idle = now - released_at.get(conn.alias, 0.0)
+            if idle >= self.health_check_interval and not conn.is_usable():
+                conn.close()
+                with self._lock:
+                    self.discarded += 1
+
+    def _release_connections(self) -> None:
+        """Honor CONN_MAX_AGE, drop broken connections and record the use"""
+        close_old_connections()
+        now = time.monotonic()
+        self._local.released_at = {
+            conn.alias: now
+            for conn in connections.all()
+            if conn.connection is not None
+        }
+
+    def _call(self, func: Callable, args: tuple, kwargs: dict) -> Any:
+        """Run inside a pool thread"""
+        with self._lock:
+            self.waiting -= 1
+            self.in_use += 1
+        self._local.active = True
+        try:
+            self._prepare_connections()
+            with ExitStack() as stack:
+                # Count the queries when serving an instrumented request
+                if current_timings.get() is not None:
+                    for conn in connections.all():
+                        stack.enter_context(conn.execute_wrapper(db_query_timer))
+                return func(*args, **kwargs)
+        finally:
+            self._release_connections()
+            self._local.active = False
+            with self._lock:
+                self.in_use -= 1
+                self.served += 1
+
+    def _submit(self, func: Callable, args: tuple, kwargs: dict):
+        with self._lock:
+            self.waiting += 1
+        # Keep the request context (e.g. the metrics) in the pool thread
+        context = contextvars.copy_context()
+        return self.executor.submit(context.run, self._call, func, args, kwargs)
+
+    def _reject(self) -> None:
+        with self._lock:
+            self.waiting -= 1
+            self.timeouts += 1
+        raise_http_exception.service_unavailable("Database busy, try again later")
+
+    def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Run a blocking ORM function in the pool and wait for the result.
+
+        Nested calls made from a pool thread run inline.
+        """
+        if getattr(self._local, "active", False):
+            return func(*args, **kwargs)
+        future = self._submit(func, args, kwargs)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # Only the wait for a connection is bounded, not the query
+            if future.cancel():
+                self._reject()
+            return future.result()
+
+    async def run_async(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Run a blocking ORM function in the pool without blocking the loop.
+        """
+        future = self._submit(func, args, kwargs)
+        wrapped = asyncio.wrap_future(future)
+        done, _ = await asyncio.wait({wrapped}, timeout=self.timeout)
+        if not done and future.cancel():
+            self._reject()
+        return await wrapped
+
+    def stats(self) -> dict:
+        """Return the pool utilization counters"""
+        with self._lock:
+            return {
+                "size": self.size,
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "utilization": self.in_use / self.size if self.size else 0.0,
+                "served": self.served,
+                "timeouts": self.timeouts,
+                "discarded": self.discarded,
+            }
+
+
+db_pool = ConnectionPool(
+    size=DB_MAX_CONNECTIONS,
+    timeout=DB_POOL_TIMEOUT,
+    health_checks=DB_HEALTH_CHECKS,
+    health_check_interval=DB_HEALTH_CHECK_INTERVAL,
+)
+
+os.register_at_fork(after_in_child=db_pool.reset_after_fork)
+
+
+#######################################
+#            Pool Helpers             #
+#######################################
+
+
+async def run_in_db(func: Callable, *args, **kwargs) -> Any:
+    """
+    Run a blocking ORM function in the connection pool.
+
+    Params:
+    - func: Callable - The sync function that use the ORM
+    - args, kwargs - The func arguments
+    Return:
+    - result: Any - The func result
+    """
+    return await db_pool.run_async(func, *args, **kwargs)
+
+
+def db_connection(func: Callable) -> Callable:
+    """
+    Decorator, make a sync ORM function run with a pooled connection.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return db_pool.run(func, *args, **kwargs)
+
+    return wrapper
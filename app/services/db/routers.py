@@ -0,0 +1,154 @@
+"""
+Read replicas routing.
+
+The reads of the API requests go to a random replica and the writes to
+the primary (`default`). A request that writes is pinned to the primary
+for the rest of the request and the client gets a short lived cookie, so
+its next reads (e.g. the `/current` after an update) stick to the primary
+while the replicas catch up.
+
+Everything outside a request (management commands, outbox and scheduler
+workers, the importer) reads from the primary: those jobs read the state
+they have just written or are about to write (checkpoints, due emails,
+existing emails), a lagging replica would make them send or insert twice.
+"""
+
+import random
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+#######################################
+#          Per Request State          #
+#######################################
+
+# Cookie of the clients that wrote recently
+PIN_COOKIE_NAME = "db_primary"
+
+
+class ReplicaState:
+    """Read from the primary, and whether the request has written"""
+
+    __slots__ = ("pinned", "wrote")
+
+    def __init__(self, pinned: bool = False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+# Set per request by `ReplicaPinningMiddleware`, it is copied into the DB
+# pool threads and the router mutates the same object.
+current_replica_state = contextvars.ContextVar("current_replica_state", default=None)
+
+
+def primary_pinned() -> bool:
+    """Whether the reads of the current request must see the latest writes"""
+    state = current_replica_state.get()
+    return state is not None and state.pinned
+
+
+def replica_allowed() -> bool:
+    """Whether the reads can go to a replica: only in a request not pinned"""
+    state = current_replica_state.get()
+    return state is not None and not state.pinned
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside the block of a request"""
+    token = current_replica_state.set(ReplicaState(pinned=True))
+    try:
+        yield
+    finally:
+        current_replica_state.reset(token)
+
+
+#######################################
+#               Router                #
+#######################################
+
+
+class ReplicaRouter:
+    """
+    Django database router, enabled when `DB_REPLICAS` is set.
+    """
+
+    def __init__(self):
+        self.replicas = [
+            alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS
+        ]
+
+    def db_for_read(self, model, **hints):
+        if (
+            not self.replicas
+            or not replica_allowed()
+            # Reads in a transaction (e.g. select_for_update) use the primary
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(self.replicas)
+
+    def db_for_write(self, model, **hints):
+        state = current_replica_state.get()
+        if state is not None:
+            state.pinned = True
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data in every alias
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replicas get the schema through the replication
+        return db == DEFAULT_DB_ALIAS
+
+
+#######################################
+#         Pinning Middleware          #
+#######################################
+
+
+class ReplicaPinningMiddleware:
+    """
+    ASGI middleware, pin to the primary the requests of the clients that
+    wrote in the last `sticky_seconds`.
+    """
+
+    def __init__(self, app, sticky_seconds: int):
+        self.app = app
+        self.pin_cookie = (
+            f"{PIN_COOKIE_NAME}=1; Max-Age={sticky_seconds}; Path=/; "
+            "HttpOnly; SameSite=Lax"
+        ).encode("latin-1")
+
+    @staticmethod
+    def _has_pin_cookie(scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                for cookie in value.decode("latin-1").split(";"):
+                    if cookie.strip().startswith(f"{PIN_COOKIE_NAME}="):
+                        return True
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        state = ReplicaState(pinned=self._has_pin_cookie(scope))
+        token = current_replica_state.set(state)
+
+        async def send_with_pin(message):
+            if message["type"] == "http.response.start" and state.wrote:
+                headers = list(message.get("headers", []))
+                headers.append((b"set-cookie", self.pin_cookie))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_pin)
+        finally:
+            current_replica_state.reset(token)
@@ -0,0 +1,58 @@
+"""
+DB routing tests, run them with `python manage.py test services.db`.
+"""
+
+from django.test import SimpleTestCase
+
+from mailing.models import Broadcast, EmailOutbox
+from users.models import User
+
+from .routers import ReplicaRouter, ReplicaState, current_replica_state, use_primary
+
+
+#######################################
+#           Replica Router            #
+#######################################
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.router.replicas = ["replica1"]
+
+    def in_request(self, pinned: bool = False) -> ReplicaState:
+        # What `ReplicaPinningMiddleware` sets for each request
+        state = ReplicaState(pinned=pinned)
+        token = current_replica_state.set(state)
+        self.addCleanup(current_replica_state.reset, token)
+        return state
+
+    def test_commands_read_from_the_primary(self):
+        # No request state: management commands and workers
+        for model in (Broadcast, EmailOutbox, User):
+            self.assertEqual(self.router.db_for_read(model), "default")
+
+    def test_requests_read_from_a_replica(self):
+        self.in_request()
+
+        self.assertEqual(self.router.db_for_read(User), "replica1")
+
+    def test_request_reads_after_a_write_use_the_primary(self):
+        state = self.in_request()
+
+        self.router.db_for_write(User)
+
+        self.assertTrue(state.wrote)
+        self.assertEqual(self.router.db_for_read(User), "default")
+
+    def test_pinned_client_reads_from_the_primary(self):
+        self.in_request(pinned=True)
+
+        self.assertEqual(self.router.db_for_read(User), "default")
+
+    def test_use_primary_in_a_request(self):
+        self.in_request()
+
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(User), "default")
+        self.assertEqual(self.router.db_for_read(User), "replica1")
@@ -6,7 +6,11 @@ import base64
 from typing import List
 from datetime import datetime
 
-from app.settings import SERVER_HOST
+from django.utils.functional import SimpleLazyObject
+from sendgrid.helpers.mail import Mail
+
+from app.settings import SERVER_HOST, EMAIL_TEMPLATES_DIR, EMAIL_TEMPLATES_RELOAD
+from .rendering import EmailTemplates
 from .sender import EmailSender
 
 
@@ -14,7 +18,14 @@ from .sender import EmailSender
 ##       Email Sender Abstraction        ##
 ###########################################
 
-sender = EmailSender()
+# Built on first use, importing this module does not create the
+# provider client (nor its connection pool).
+sender = SimpleLazyObject(EmailSender)
+
+# Compiled once per process, on first use
+templates = SimpleLazyObject(
+    lambda: EmailTemplates(EMAIL_TEMPLATES_DIR, auto_reload=EMAIL_TEMPLATES_RELOAD)
+)
 
 
 #######################################
@@ -22,54 +33,86 @@ sender = EmailSender()
 #######################################
 
 
-def send_welcome_email(username: str, email: str) -> None:
+def build_welcome_email(username: str, email: str) -> Mail:
     """
-    Send a welcome email.
+    Create a welcome email.
 
     Params:
     ------
     - username: str - The username of the new user
     - email: str - The target email
     """
-
-    # TODO ...
-    # Load html templates and get the content from it.
-    # html_content = ...
-
-    content = f"<h1>Welcome to app, {username}</h1>"
-    email = sender.create_email(
+    html_content, text_content = templates.render("welcome", {"username": username})
+    return sender.create_email(
         to_list=[email],
         subject=f"Welcome from {{ app }}",
-        html_content=content,
+        html_content=html_content,
+        text_content=text_content,
     )
-    sender.send_email(email_to_send=email)
 
 
-def send_recovery_password_email(token: str, email: str) -> None:
+def build_recovery_password_email(token: str, email: str) -> Mail:
     """
-    Send a recovery password email.
+    Create a recovery password email.
 
     Params:
     ------
     - token: str - The encoded special token
     - email: str - The user email
     """
-
-    # TODO ...
-    # Load html templates and get the content from it.
-    # html_content = ...
-
     # You must have to send this as a anchor
     # to my-domain.com/reset-password?token=ad5a....
     link = f"{SERVER_HOST}/reset-password?token={token}"
-    content = f"""
-    <h1>Reset your password</h1>
-    <p></p>
-    <a href="{link}" target="_blank" rel="noopener noreferrer">Press here</a>
-    """
-    email = sender.create_email(
+    html_content, text_content = templates.render("recovery_password", {"link": link})
+    return sender.create_email(
         to_list=[email],
         subject=f"Recovery Password",
-        html_content=content,
+        html_content=html_content,
+        text_content=text_content,
     )
-    sender.send_email(email_to_send=email)
+
+
+def build_queued_recovery_password_email(email: str) -> Mail:
+    """
+    Create a recovery password email from the outbox, the token is
+    created at send time so it is never stored.
+
+    Params:
+    ------
+    - email: str - The user email
+    """
+    from services.auth.utils import create_access_token
+
+    token = create_access_token(email, recovery_password=True)
+    return build_recovery_password_email(token, email)
+
+
+# Email kinds that can be stored in the outbox (see `mailing.outbox`)
+EMAIL_BUILDERS = {
+    "welcome": build_welcome_email,
+    "recovery_password": build_queued_recovery_password_email,
+}
+
+
+def send_welcome_email(username: str, email: str) -> None:
+    """
+    Send a welcome email.
+
+    Params:
+    ------
+    - username: str - The username of the new user
+    - email: str - The target email
+    """
+    sender.send_email(email_to_send=build_welcome_email(username, email))
+
+
+def send_recovery_password_email(token: str, email: str) -> None:
+    """
+    Send a recovery password email.
+
+    Params:
+    ------
+    - token: str - The encoded special token
+    - email: str - The user email
+    """
+    sender.send_email(email_to_send=build_recovery_password_email(token, email))
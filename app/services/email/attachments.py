@@ -0,0 +1,124 @@
+"""
+Email attachments.
+
+The attachments are base64 encoded once and the encoded content is
+shared by all the messages with the same file, instead of being encoded
+again for every recipient. Files are read through `mmap`, so they are
+hashed and encoded without an extra copy in memory.
+"""
+
+import base64
+import hashlib
+import mmap
+from pathlib import Path
+from typing import Union
+
+from app.settings import EMAIL_MAX_ATTACHMENT_MB, EMAIL_ATTACHMENT_CACHE_SIZE
+from services.cache import TTLCache
+
+
+# Raw bytes (or a memory-mapped file) or the path of a file
+AttachmentSource = Union[bytes, bytearray, memoryview, mmap.mmap, str, Path]
+
+
+class AttachmentTooLarge(ValueError):
+    """The attachment exceeds the size limit"""
+
+
+#######################################
+#          Encoded Attachment         #
+#######################################
+
+
+class EncodedAttachment:
+    """
+    A base64 encoded attachment, shared by the messages that carry it.
+    """
+
+    __slots__ = ("content", "digest", "size")
+
+    def __init__(self, content: str, digest: str, size: int):
+        self.content = content
+        self.digest = digest
+        self.size = size
+
+
+class AttachmentCache:
+    """
+    Encoded attachments by content hash.
+
+    Params:
+    - max_bytes: int - Size limit of an attachment, checked before encoding
+    - maxsize: int - Max encoded attachments kept in memory
+    - ttl: float - Seconds an encoded attachment is kept
+    """
+
+    def __init__(self, max_bytes: int, maxsize: int = 8, ttl: float = 600.0):
+        self.max_bytes = max_bytes
+        self.encodings = 0
+        self._encoded = TTLCache(maxsize=maxsize, ttl=ttl)
+        # (path, mtime, size) -> content hash, avoids hashing the same file
+        self._digests = TTLCache(maxsize=maxsize * 4, ttl=ttl)
+
+    def _check_size(self, size: int) -> None:
+        if size > self.max_bytes:
+            raise AttachmentTooLarge(
+                f"The attachment has {size} bytes, the limit is {self.max_bytes}"
+            )
+
+    def _encode(self, digest: str, data, size: int) -> EncodedAttachment:
+        attachment = self._encoded.get(digest)
+        if attachment is None:
+            content = base64.b64encode(data).decode("ascii")
+            attachment = EncodedAttachment(content, digest, size)
+            self._encoded.set(digest, attachment)
+            self.encodings += 1
+        return attachment
+
+    def load(self, source: AttachmentSource) -> EncodedAttachment:
+        """
+        Return the encoded attachment, encoding it only on a cache miss.
+
+        Params:
+        - source: AttachmentSource - The content or the path of the file
+        Return:
+        - attachment: EncodedAttachment - The base64 content and its hash
+        Raises:
+        - AttachmentTooLarge: If the content exceeds `max_bytes`
+        """
+        if isinstance(source, (str, Path)):
+            return self._load_file(Path(source))
+        with memoryview(source) as data:
+            self._check_size(data.nbytes)
+            digest = hashlib.sha256(data).hexdigest()
+            return self._encode(digest, data, data.nbytes)
+
+    def _load_file(self, path: Path) -> EncodedAttachment:
+        stat = path.stat()
+        self._check_size(stat.st_size)
+        key = (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+        digest = self._digests.get(key)
+        if digest is not None:
+            attachment = self._encoded.get(digest)
+            if attachment is not None:
+                return attachment
+
+        if stat.st_size == 0:
+            # An empty file can not be mapped
+            return self.load(b"")
+        with open(path, "rb") as file, mmap.mmap(
+            file.fileno(), 0, access=mmap.ACCESS_READ
+        ) as data:
+            digest = hashlib.sha256(data).hexdigest()
+            self._digests.set(key, digest)
+            return self._encode(digest, data, stat.st_size)
+
+    def stats(self) -> dict:
+        """Return the cache counters"""
+        return dict(self._encoded.stats(), encodings=self.encodings)
+
+
+attachment_cache = AttachmentCache(
+    max_bytes=int(EMAIL_MAX_ATTACHMENT_MB * 1024 * 1024),
+    maxsize=EMAIL_ATTACHMENT_CACHE_SIZE,
+)
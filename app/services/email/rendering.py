@@ -0,0 +1,128 @@
+"""
+Email templates rendering.
+
+The templates (`<name>.html` and an optional `<name>.txt` plain text
+version) are loaded from disk and compiled once per process with the
+Django template engine, then every email only renders the compiled node
+tree. With `auto_reload` (dev) the changed files are compiled again.
+"""
+
+import os
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+from django.template import Context, Engine, Template, TemplateDoesNotExist
+from django.utils.html import strip_tags
+
+
+# Compiled templates are kept by the cached loader
+CACHED_LOADERS = [
+    (
+        "django.template.loaders.cached.Loader",
+        ["django.template.loaders.filesystem.Loader"],
+    )
+]
+
+
+#######################################
+#           Email Templates           #
+#######################################
+
+
+class EmailTemplates:
+    """
+    Precompiled and cached email templates.
+
+    Params:
+    - directory: str - The templates directory
+    - auto_reload: bool - Compile again the templates changed on disk
+    """
+
+    def __init__(self, directory: str, auto_reload: bool = False):
+        self.directory = str(directory)
+        self.auto_reload = auto_reload
+        # HTML is escaped, the plain text version is not
+        self.html_engine = Engine(
+            dirs=[self.directory], loaders=CACHED_LOADERS, autoescape=True
+        )
+        self.text_engine = Engine(
+            dirs=[self.directory], loaders=CACHED_LOADERS, autoescape=False
+        )
+        self._lock = threading.Lock()
+        self._mtimes = self._scan() if auto_reload else {}
+
+    def _scan(self) -> dict:
+        mtimes = {}
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                mtimes[path] = os.stat(path).st_mtime_ns
+        return mtimes
+
+    def _reload_changed(self) -> None:
+        """Drop the compiled templates if any file changed (dev only)"""
+        mtimes = self._scan()
+        with self._lock:
+            if mtimes == self._mtimes:
+                return
+            self._mtimes = mtimes
+            for engine in (self.html_engine, self.text_engine):
+                for loader in engine.template_loaders:
+                    loader.reset()
+
+    def get(self, name: str) -> Tuple[Template, Optional[Template]]:
+        """
+        Return the compiled templates of an email.
+
+        Params:
+        - name: str - The template name, without extension
+        Return:
+        - (html, text): The HTML template and the text one (None if missing)
+        """
+        if self.auto_reload:
+            self._reload_changed()
+        html = self.html_engine.get_template(f"{name}.html")
+        try:
+            text = self.text_engine.get_template(f"{name}.txt")
+        except TemplateDoesNotExist:
+            text = None
+        return html, text
+
+    @staticmethod
+    def _render(
+        html: Template, text: Optional[Template], context: dict
+    ) -> Tuple[str, str]:
+        html_content = html.render(Context(context))
+        if text is None:
+            # Derive the plain text version from the HTML
+            return html_content, strip_tags(html_content).strip()
+        return html_content, text.render(Context(context))
+
+    def render(self, name: str, context: dict) -> Tuple[str, str]:
+        """
+        Render an email.
+
+        Params:
+        - name: str - The template name, without extension
+        - context: dict - The template variables
+        Return:
+        - (html_content, text_content): The two parts of the email
+        """
+        html, text = self.get(name)
+        return self._render(html, text, context)
+
+    def render_batch(
+        self, name: str, contexts: Iterable[dict]
+    ) -> List[Tuple[str, str]]:
+        """
+        Render the same email for several recipients, the templates are
+        looked up once for the whole batch.
+
+        Params:
+        - name: str - The template name, without extension
+        - contexts: Iterable[dict] - The template variables per email
+        Return:
+        - emails: List[Tuple[str, str]] - (html_content, text_content) pairs
+        """
+        html, text = self.get(name)
+        return [self._render(html, text, context) for context in contexts]
@@ -2,15 +2,45 @@
 Email sender class.
 """
 
+import html
 import time
-from typing import List
+from typing import Dict, List, Tuple
 from datetime import datetime
 
-from sendgrid import SendGridAPIClient, SendGridException
 from sendgrid.helpers import mail
 from fastapi import HTTPException
 
-from app.settings import SENDGRID_API_KEY, EMAIL_DOMAIM
+from app.settings import (
+    SENDGRID_API_KEY,
+    SENDGRID_API_HOST,
+    EMAIL_DOMAIM,
+    EMAIL_TRANSPORT,
+    EMAIL_HTTP_MAX_CONNECTIONS,
+    EMAIL_HTTP_TIMEOUT,
+)
+from .attachments import AttachmentSource, attachment_cache
+from .transports import AsyncHTTPTransport, EmailTransportError, SendGridTransport
+
+
+# SendGrid accepts up to 1000 personalizations per request
+MAX_PERSONALIZATIONS = 1000
+
+
+def get_transport(name: str = EMAIL_TRANSPORT):
+    """
+    Build the email transport selected in settings.
+
+    Params:
+    - name: str - "sendgrid" (default) or "http" (keep-alive async client)
+    """
+    if name == "http":
+        return AsyncHTTPTransport(
+            api_key=SENDGRID_API_KEY,
+            host=SENDGRID_API_HOST,
+            max_connections=EMAIL_HTTP_MAX_CONNECTIONS,
+            timeout=EMAIL_HTTP_TIMEOUT,
+        )
+    return SendGridTransport(api_key=SENDGRID_API_KEY, host=SENDGRID_API_HOST)
 
 
 #######################################
@@ -23,8 +53,8 @@ class EmailSender:
     Email sender.
     """
 
-    def __init__(self):
-        self.sendgrid = SendGridAPIClient(api_key=SENDGRID_API_KEY)
+    def __init__(self, transport=None):
+        self.transport = transport or get_transport()
         self.from_email = EMAIL_DOMAIM
 
     def create_email(
@@ -32,9 +62,10 @@ class EmailSender:
         to_list: List[str],
         subject: str,
         html_content: str,
-        image: bytes = None,
+        image: AttachmentSource = None,
         content_type: str = None,
         send_at: datetime = None,
+        text_content: str = None,
     ) -> mail.Mail:
         """
         Create a new sendgrid email object.
@@ -43,9 +74,11 @@ class EmailSender:
         - to_list: List[str] - The recipients list.
         - subject: str - The email subject.
         - html_content: str - HTML text to fill the email.
-        - image: bytes - A optional image to attachment in email.
+        - image: bytes | str | Path - A optional image to attachment in email,
+          its content or its file path.
         - content_type: str - The content type of the image.
         - send_at: datetime - The datetime when the email must be sended.
+        - text_content: str - Optional plain text version of the email.
         Return:
         - message: Mail - The sendgrid email object.
         """
@@ -59,31 +92,127 @@ class EmailSender:
         message.to = _users_list
 
         if image:
-            ext = str(content_type).split("/")[1]
-            timestamp = datetime.utcnow().strftime("%Y-%m-%d-%H%M%S")
-            message.attachment = mail.Attachment(
-                mail.FileContent(image),
-                mail.FileName(f"event_image-{timestamp}.{ext}"),
-                mail.FileType(str(content_type)),
-                mail.Disposition("attachment"),
-            )
+            self.attach(message, image, content_type)
 
         if send_at:
             message.send_at = mail.SendAt(self.get_unix_time(send_at), p=0)
 
+        contents = [mail.Content(mail.MimeType.html, html_content)]
+        if text_content:
+            # The text/plain part must come before the html one
+            contents.insert(0, mail.Content(mail.MimeType.text, text_content))
+        message.content = contents
+        return message
+
+    def create_bulk_email(
+        self,
+        recipients: List[Tuple[str, Dict[str, str]]],
+        subject: str,
+        html_content: str,
+        image: AttachmentSource = None,
+        content_type: str = None,
+    ) -> mail.Mail:
+        """
+        Create a sendgrid email with one personalization per recipient.
+
+        Each recipient gets its own copy, with the substitution tags in
+        `html_content` and `subject` (e.g. "-name-") replaced. The values
+        are HTML escaped in `html_content` and raw in the plain text subject.
+
+        Params:
+        - recipients: List[Tuple[str, dict]] - Pairs of (email, substitutions),
+          the substitution values are raw text.
+        - subject: str - The email subject.
+        - html_content: str - HTML text to fill the email.
+        - image: bytes | str | Path - A optional image to attachment in email.
+        - content_type: str - The content type of the image.
+        Return:
+        - message: Mail - The sendgrid email object.
+        """
+        if len(recipients) > MAX_PERSONALIZATIONS:
+            raise ValueError(f"At most {MAX_PERSONALIZATIONS} recipients per email")
+
+        message = mail.Mail()
+        message.from_email = mail.From(self.from_email)
+        message.subject = mail.Subject(subject)
+        for email, substitutions in recipients:
+            personalization = mail.Personalization()
+            personalization.add_to(mail.To(email))
+            recipient_subject = subject
+            for key, value in substitutions.items():
+                value = str(value)
+                recipient_subject = recipient_subject.replace(key, value)
+                personalization.add_substitution(
+                    mail.Substitution(key, html.escape(value))
+                )
+            personalization.subject = recipient_subject
+            message.add_personalization(personalization)
+
+        if image:
+            self.attach(message, image, content_type)
         message.content = mail.Content(mail.MimeType.html, html_content)
         return message
 
+    def attach(
+        self, message: mail.Mail, image: AttachmentSource, content_type: str
+    ) -> None:
+        """
+        Attach an image to the email.
+
+        The base64 content is cached by content hash, the messages with the
+        same image share it instead of encoding it again.
+
+        Params:
+        - message: Mail - The sendgrid email object.
+        - image: bytes | str | Path - The image content or its file path.
+        - content_type: str - The content type of the image.
+        Raises:
+        - AttachmentTooLarge: If the image exceeds `EMAIL_MAX_ATTACHMENT_MB`
+        """
+        attachment = attachment_cache.load(image)
+        ext = str(content_type).split("/")[1]
+        timestamp = datetime.utcnow().strftime("%Y-%m-%d-%H%M%S")
+        message.attachment = mail.Attachment(
+            mail.FileContent(attachment.content),
+            mail.FileName(f"event_image-{timestamp}.{ext}"),
+            mail.FileType(str(content_type)),
+            mail.Disposition("attachment"),
+        )
+
+    def deliver(self, email_to_send: mail.Mail) -> None:
+        """
+        Send the email, for the background senders (outbox, broadcasts)
+        that record the provider error.
+
+        Params:
+        email_to_send: Mail - The sendgrid email object to send.
+        Raises:
+        - EmailTransportError: With the provider message
+        """
+        self.transport.send(email_to_send)
+
     def send_email(self, email_to_send: mail.Mail) -> None:
         """
-        Send the email.
+        Send the email from a request, a failure is a 500 response.
+
+        Params:
+        email_to_send: Mail - The sendgrid email object to send.
+        """
+        try:
+            self.deliver(email_to_send)
+        except EmailTransportError:
+            raise HTTPException(500, "Server Error")
+
+    async def send_email_async(self, email_to_send: mail.Mail) -> None:
+        """
+        Send the email without blocking the event loop.
 
         Params:
         email_to_send: Mail - The sendgrid email object to send.
         """
         try:
-            self.sendgrid.send(email_to_send)
-        except SendGridException:
+            await self.transport.send_async(email_to_send)
+        except EmailTransportError:
             raise HTTPException(500, "Server Error")
 
     def get_unix_time(self, date_time: datetime) -> int:
@@ -0,0 +1,138 @@
+"""
+Email transports, how the sendgrid messages reach the provider.
+"""
+
+import asyncio
+import threading
+
+from sendgrid import SendGridException
+from sendgrid.helpers import mail
+from python_http_client.exceptions import HTTPError
+
+
+class EmailTransportError(Exception):
+    """The email provider rejected the message or was unreachable"""
+
+
+#######################################
+#          SendGrid Transport         #
+#######################################
+
+
+class SendGridTransport:
+    """
+    The official sendgrid client, it opens a new connection per email.
+    """
+
+    def __init__(self, api_key: str, host: str):
+        self.api_key = api_key
+        self.host = host
+        self._client = None
+
+    @property
+    def client(self):
+        """The sendgrid client, created on the first send"""
+        if self._client is None:
+            from sendgrid import SendGridAPIClient
+
+            self._client = SendGridAPIClient(api_key=self.api_key, host=self.host)
+        return self._client
+
+    def send(self, message: mail.Mail) -> None:
+        """Send a message, raise EmailTransportError on failure"""
+        try:
+            self.client.send(message)
+        except (SendGridException, HTTPError) as error:
+            # The provider explains the rejection in the response body
+            body = getattr(error, "body", b"") or b""
+            if isinstance(body, bytes):
+                body = body.decode(errors="replace")
+            detail = f"{error}: {body}" if body else str(error)
+            raise EmailTransportError(detail) from error
+
+    async def send_async(self, message: mail.Mail) -> None:
+        """Send a message without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.send, message)
+
+    def close(self) -> None:
+        pass
+
+
+#######################################
+#      Keep-alive HTTP Transport      #
+#######################################
+
+
+class AsyncHTTPTransport:
+    """
+    Pooled keep-alive transport built on `httpx.AsyncClient`.
+
+    Connections are reused between emails, avoiding a TCP + TLS
+    handshake per send. The client lives in its own event loop thread,
+    so sync callers (e.g. the outbox worker threads) share the pool.
+
+    Params:
+    - api_key: str - The sendgrid api key
+    - host: str - The sendgrid api host
+    - max_connections: int - Max concurrent connections (and requests)
+    - timeout: float - Seconds for connect, read and write operations
+    """
+
+    def __init__(
+        self, api_key: str, host: str, max_connections: int = 10, timeout: float = 10
+    ):
+        # Optional dependency, only needed when this transport is selected
+        import httpx
+
+        self.client = httpx.AsyncClient(
+            base_url=host,
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            },
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=httpx.Timeout(timeout),
+        )
+        self._httpx_error = httpx.HTTPError
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(
+                        target=loop.run_forever, name="email-transport", daemon=True
+                    ).start()
+                    self._loop = loop
+        return self._loop
+
+    async def _post(self, message: mail.Mail) -> None:
+        try:
+            response = await self.client.post("/v3/mail/send", json=message.get())
+        except self._httpx_error as error:
+            raise EmailTransportError(str(error)) from error
+        if response.status_code >= 400:
+            raise EmailTransportError(f"{response.status_code}: {response.text}")
+
+    async def send_async(self, message: mail.Mail) -> None:
+        """Send a message from any event loop through the shared pool"""
+        future = asyncio.run_coroutine_threadsafe(self._post(message), self._get_loop())
+        await asyncio.wrap_future(future)
+
+    def send(self, message: mail.Mail) -> None:
+        """Send a message and wait for the result"""
+        asyncio.run_coroutine_threadsafe(self._post(message), self._get_loop()).result()
+
+    def close(self) -> None:
+        """Close the pooled connections and stop the loop"""
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.client.aclose(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
@@ -0,0 +1,228 @@
+"""
+Per request performance instrumentation.
+
+- `timed(phase)` measures a phase of the current request.
+- `db_query_timer` counts the ORM queries through `execute_wrapper`.
+- `TimingMiddleware` emits the `Server-Timing` header (opt-in) and feeds the
+  per route latency histograms exposed in Prometheus format.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+
+#######################################
+#          Request Timings            #
+#######################################
+
+
+class RequestTimings:
+    """Durations (in seconds) of the phases of one request"""
+
+    __slots__ = ("start", "phases", "queries")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.queries = 0
+
+    def add(self, phase: str, elapsed: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + elapsed
+
+    def server_timing(self) -> str:
+        """Render the `Server-Timing` header value"""
+        total = time.perf_counter() - self.start
+        items = []
+        for phase, elapsed in self.phases.items():
+            if phase == "db":
+                items.append(
+                    f'db;dur={elapsed * 1000:.2f};desc="{self.queries} queries"'
+                )
+            else:
+                items.append(f"{phase};dur={elapsed * 1000:.2f}")
+        items.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(items)
+
+
+# The record of the request being served, thread pools copy the context
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "current_timings", default=None
+)
+
+
+@contextmanager
+def timed(phase: str):
+    """Add the duration of the block to a phase of the current request"""
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - start)
+
+
+def db_query_timer(execute, sql, params, many, context):
+    """
+    Django `connection.execute_wrapper` hook, count and time the
+    queries of the current request.
+    """
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.add("db", time.perf_counter() - start)
+
+
+#######################################
+#        Latency Histograms           #
+#######################################
+
+# Seconds, same defaults as the Prometheus clients
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class MetricsRegistry:
+    """Per route latency histograms plus external stats collectors"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._routes: Dict[tuple, list] = {}
+        self._collectors: Dict[str, Callable[[], dict]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, method: str, route: str, status: int, timings: RequestTimings):
+        elapsed = time.perf_counter() - timings.start
+        key = (method, route, str(status))
+        with self._lock:
+            entry = self._routes.get(key)
+            if entry is None:
+                # [bucket counts, count, sum, db queries, phase sums]
+                entry = [[0] * len(self.buckets), 0, 0.0, 0, {}]
+                self._routes[key] = entry
+            for index, bound in enumerate(self.buckets):
+                if elapsed <= bound:
+                    entry[0][index] += 1
+            entry[1] += 1
+            entry[2] += elapsed
+            entry[3] += timings.queries
+            for phase, phase_elapsed in timings.phases.items():
+                entry[4][phase] = entry[4].get(phase, 0.0) + phase_elapsed
+
+    def register(self, name: str, collector: Callable[[], dict]) -> None:
+        """
+        Expose the numeric values of `collector()` as gauges.
+
+        Params:
+        - name: str - Metric prefix, e.g. "user_cache"
+        - collector: Callable - Return a dict of numbers (e.g. a stats method)
+        """
+        self._collectors[name] = collector
+
+    def render(self) -> str:
+        """Render all the metrics in the Prometheus text format"""
+        lines = [
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            routes = {
+                key: (list(v[0]), v[1], v[2], v[3], dict(v[4]))
+                for key, v in self._routes.items()
+            }
+        for (method, route, status), entry in sorted(routes.items()):
+            buckets, count, total, queries, phases = entry
+            labels = f'method="{method}",route="{route}",status="{status}"'
+            for bound, bucket_count in zip(self.buckets, buckets):
+                lines.append(
+                    f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} '
+                    f"{bucket_count}"
+                )
+            lines.append(
+                f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {count}'
+            )
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {total}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {count}")
+            lines.append(f"http_request_db_queries_total{{{labels}}} {queries}")
+            for phase, phase_total in sorted(phases.items()):
+                lines.append(
+                    f'http_request_phase_seconds_total{{{labels},phase="{phase}"}} '
+                    f"{phase_total}"
+                )
+
+        for name, collector in sorted(self._collectors.items()):
+            for key, value in collector().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"{name}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+#######################################
+#          Timing Middleware          #
+#######################################
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware, a raw one so the streaming responses are not
+    buffered and the cost per request is a few `perf_counter` calls.
+    The `Server-Timing` header is only added with `server_timing`.
+    """
+
+    def __init__(
+        self, app, registry: MetricsRegistry = metrics, server_timing: bool = False
+    ):
+        self.app = app
+        self.registry = registry
+        self.server_timing = server_timing
+        self._route_paths = None
+
+    def _route_label(self, scope) -> str:
+        # Label by path template, never by raw path (unbounded cardinality)
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._route_paths is None:
+            routes = getattr(scope.get("app"), "routes", [])
+            self._route_paths = {
+                getattr(route, "endpoint", None): route.path for route in routes
+            }
+        return self._route_paths.get(endpoint, endpoint.__name__)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    value = timings.server_timing().encode()
+                    headers.append((b"server-timing", value))
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_timings.reset(token)
+            self.registry.observe(
+                scope["method"], self._route_label(scope), status, timings
+            )
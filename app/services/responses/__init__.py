@@ -2,9 +2,79 @@
 Common response and HTTP exceptions.
 """
 
+import json
+from datetime import date, datetime, time
+from typing import Any, Callable, Optional
+
 from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel, Field
 
+from app.settings import JSON_ENCODER
+
+
+#######################################
+#            JSON Encoding            #
+#######################################
+
+
+def _encode_default(value: Any) -> Any:
+    # Same as `jsonable_encoder`: ISO 8601 dates, models as dicts
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, BaseModel):
+        return value.dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _json_dumps(content: Any) -> bytes:
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+        default=_encode_default,
+    ).encode("utf-8")
+
+
+def get_json_encoder(name: str = JSON_ENCODER) -> Callable[[Any], bytes]:
+    """
+    Select the JSON encoder of the responses.
+
+    Params:
+    - name: str - "orjson" (default, when installed) or "json" (stdlib)
+    Return:
+    - dumps: Callable - Encode plain data (and datetimes) as JSON bytes
+    """
+    if name == "json":
+        return _json_dumps
+    try:
+        import orjson
+    except ImportError:
+        return _json_dumps
+
+    # Datetimes go through `isoformat`, the output is the same as stdlib
+    option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def _orjson_dumps(content: Any) -> bytes:
+        return orjson.dumps(content, default=_encode_default, option=option)
+
+    return _orjson_dumps
+
+
+json_dumps = get_json_encoder()
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Default response class of the API, same output as `JSONResponse`
+    but encoded with `json_dumps`.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
+
 
 #######################################
 #           Mixin Response            #
@@ -58,12 +128,24 @@ class Conflict_409(BaseModel):
     detail: str = Field(example="Operation forbidden")
 
 
+class TooManyRequests_429(BaseModel):
+    """Too Many Requests response schema"""
+
+    detail: str = Field(example="Too many requests, try again later")
+
+
 class ServerError_500(BaseModel):
     """Server Error response schema"""
 
     detail: str = Field(example="Internal server error")
 
 
+class ServiceUnavailable_503(BaseModel):
+    """Service Unavailable response schema"""
+
+    detail: str = Field(example="Server busy, try again later")
+
+
 class _RaiseHTTPExceptions:
     """
     Helper class to handle the raising of exceptions.
@@ -89,5 +171,53 @@ class _RaiseHTTPExceptions:
         """Raise a 409 - Conflict http exception"""
         raise HTTPException(status.HTTP_409_CONFLICT, detail)
 
+    def too_many_requests(self, detail: str, retry_after: int = 1) -> None:
+        """Raise a 429 - Too Many Requests http exception"""
+        raise HTTPException(
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            detail,
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    def service_unavailable(self, detail: str, retry_after: int = None) -> None:
+        """Raise a 503 - Service Unavailable http exception"""
+        headers = {"Retry-After": str(retry_after)} if retry_after else None
+        raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, detail, headers)
+
 
 raise_http_exception = _RaiseHTTPExceptions()
+
+
+#######################################
+#        Conditional Requests         #
+#######################################
+
+
+def etag_matches(header: Optional[str], etag: str, weak: bool = True) -> bool:
+    """
+    Check an `If-None-Match` (weak comparison) or `If-Match` (strong
+    comparison, `weak=False`) header against the current ETag.
+
+    Params:
+    - header: str - The header value, a list of ETags or "*"
+    - etag: str - The current (strong) ETag of the resource
+    - weak: bool - Ignore the `W/` prefix of the header ETags
+    Return:
+    - matches: bool - False when the header is missing
+    """
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if weak and candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    """A 304 - Not Modified response, no body is rendered"""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"etag": etag})
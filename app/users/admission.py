@@ -0,0 +1,75 @@
+"""
+Admission control of the users routes.
+
+Signup, login, reset password and update hash a password (PBKDF2), each
+one gets its own concurrency limit so a burst on them cannot take all
+the threadpool and slow down the cheap routes like `/current`.
+"""
+
+from fastapi import Depends
+
+from app.settings import (
+    AUTH_CONCURRENCY_LIMIT,
+    AUTH_QUEUE_DEPTH,
+    AUTH_QUEUE_TIMEOUT,
+    RATE_LIMIT_ENABLED,
+    LOGIN_RATE_PER_MINUTE,
+    LOGIN_RATE_BURST,
+    RECOVERY_RATE_PER_MINUTE,
+    RECOVERY_RATE_BURST,
+)
+from services.admission import ConcurrencyLimiter, RateLimiter
+
+
+#######################################
+#              Limiters               #
+#######################################
+
+concurrency_limiters = {
+    name: ConcurrencyLimiter(
+        name,
+        limit=AUTH_CONCURRENCY_LIMIT,
+        queue_depth=AUTH_QUEUE_DEPTH,
+        timeout=AUTH_QUEUE_TIMEOUT,
+    )
+    for name in ("signup", "login", "reset_password", "update_user")
+}
+
+rate_limiters = {
+    "login": RateLimiter(
+        "login", per_minute=LOGIN_RATE_PER_MINUTE, burst=LOGIN_RATE_BURST
+    ),
+    "password_recovery": RateLimiter(
+        "password_recovery",
+        per_minute=RECOVERY_RATE_PER_MINUTE,
+        burst=RECOVERY_RATE_BURST,
+    ),
+}
+
+
+def admission(name: str) -> list:
+    """
+    Route dependencies of the named route, the rate limit (if any) goes
+    first, so a throttled client does not take a concurrency slot.
+
+    Params:
+    - name: str - The limited route name
+    Return:
+    - dependencies: list - To use as `dependencies=` of the route
+    """
+    dependencies = []
+    if RATE_LIMIT_ENABLED and name in rate_limiters:
+        dependencies.append(Depends(rate_limiters[name]))
+    if name in concurrency_limiters:
+        dependencies.append(Depends(concurrency_limiters[name]))
+    return dependencies
+
+
+def admission_stats() -> dict:
+    """Shed and throttled requests counters, per route"""
+    stats = {}
+    for limiters in (concurrency_limiters, rate_limiters):
+        for name, limiter in limiters.items():
+            for key, value in limiter.stats().items():
+                stats[f"{name}_{key}"] = value
+    return stats
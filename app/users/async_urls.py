@@ -0,0 +1,265 @@
+"""
+User router (native async handlers)
+
+Same API as `users.urls` but the handlers are coroutines, the ORM work
+runs in the DB connection pool instead of the request threadpool.
+"""
+
+from fastapi import APIRouter, Body, Depends, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from django.conf.global_settings import SESSION_COOKIE_AGE
+
+from app.settings import AUTH_FAT_TOKENS, DEBUG
+from services import responses
+from services.auth.utils import (
+    COOKIE_SESSION_NAME,
+    create_session_token,
+    get_admin_user_async,
+    get_auth_user_async,
+    get_auth_user_for_write_async,
+)
+
+from .admission import admission
+from .views import (
+    asyncUserService,
+    user_update_fields,
+    parse_fields,
+    parse_import_format,
+)
+from .shcemas import (
+    UserDto,
+    UserCreateDto,
+    LoginUserDto,
+    UserUpdateDto,
+    UserPageDto,
+    UserImportReport,
+)
+from .serializers import UserJSONResponse, render_json, user_etag
+
+
+#######################################
+#            Users Router             #
+#######################################
+
+router = APIRouter()
+
+
+def set_session_cookie(response: Response, user: dict) -> None:
+    """Create the session token and attach it to the response"""
+    response.set_cookie(
+        key=COOKIE_SESSION_NAME,
+        value=create_session_token(user),
+        max_age=SESSION_COOKIE_AGE,
+        secure=not DEBUG,
+        httponly=not DEBUG,
+    )
+
+
+#######################################
+#         HTTP POST Operations        #
+#######################################
+
+
+@router.post(
+    "/signup",
+    status_code=201,
+    response_model=UserDto,
+    responses={
+        "409": {"model": responses.Conflict_409},
+        "503": {"model": responses.ServiceUnavailable_503},
+    },
+    dependencies=admission("signup"),
+)
+async def create_a_new_user(user_info: UserCreateDto) -> UserJSONResponse:
+    """
+    Signup: create a new user
+    """
+    user = await asyncUserService.create_user(user_info)
+    response = UserJSONResponse(user, status_code=201)
+    set_session_cookie(response, user)
+    return response
+
+
+@router.post(
+    "/login",
+    response_model=UserDto,
+    responses={
+        "401": {"model": responses.Unauthorized_401},
+        "429": {"model": responses.TooManyRequests_429},
+        "503": {"model": responses.ServiceUnavailable_503},
+    },
+    dependencies=admission("login"),
+)
+async def login_a_user(credentials: LoginUserDto) -> UserJSONResponse:
+    """
+    Login: Validate the user credentials and create a cookie session
+    """
+    user = await asyncUserService.login_user(credentials)
+    response = UserJSONResponse(user)
+    set_session_cookie(response, user)
+    return response
+
+
+@router.post(
+    "/password-recovery/{email}",
+    response_model=responses.EmailMsg,
+    responses={
+        "404": {"model": responses.NotFound_404},
+        "429": {"model": responses.TooManyRequests_429},
+    },
+    dependencies=admission("password_recovery"),
+)
+async def sent_recovery_password_email(email: str) -> any:
+    """
+    Verify is the email belogs to an active user and
+    send a recovery password email.
+    """
+    await asyncUserService.request_password_recovery(email)
+    return responses.EmailMsg(detail="Password recovery email sent")
+
+
+@router.post(
+    "/reset-password",
+    response_model=responses.Msg,
+    responses={
+        "404": {"model": responses.NotFound_404},
+        "503": {"model": responses.ServiceUnavailable_503},
+    },
+    dependencies=admission("reset_password"),
+)
+async def reset_password(
+    token: str = Body(...), new_password: str = Body(...)
+) -> any:
+    """
+    Verify the recovery token and update the user password.
+    """
+    await asyncUserService.reset_password(token, new_password)
+    return responses.Msg(detail="Password updated successfully")
+
+
+@router.post(
+    "/import",
+    response_model=UserImportReport,
+    responses={
+        "400": {"model": responses.BadRequest_400},
+        "401": {"model": responses.Unauthorized_401},
+        "403": {"model": responses.Forbidden_403},
+    },
+)
+async def import_users(
+    request: Request, admin=Depends(get_admin_user_async)
+) -> UserImportReport:
+    """
+    Bulk create users (admin only) from a `text/csv` body with an
+    email,name,password header or an `application/x-ndjson` body.
+    Rows with an existing email are reported, not created.
+    """
+    fmt = parse_import_format(request.headers.get("content-type"))
+    lines = (await request.body()).decode("utf-8").splitlines()
+    return await asyncUserService.import_users(lines, fmt)
+
+
+#######################################
+#         HTTP GET Operations         #
+#######################################
+
+
+@router.get(
+    "",
+    response_model=UserPageDto,
+    responses={
+        "200": {"content": {"application/x-ndjson": {}}},
+        "400": {"model": responses.BadRequest_400},
+        "401": {"model": responses.Unauthorized_401},
+        "403": {"model": responses.Forbidden_403},
+    },
+)
+async def list_users(
+    cursor: str = Query(None, description="The next_cursor of the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+    fields: str = Query(None, description="Comma separated fields, e.g. id,email"),
+    stream: bool = Query(False, description="Stream all the users as NDJSON"),
+    chunk_size: int = Query(2000, ge=1, le=10000),
+    admin=Depends(get_admin_user_async),
+) -> Response:
+    """
+    List the users (admin only), ordered by creation date.
+
+    Paginated with a keyset cursor, or streamed as NDJSON with `stream=true`.
+    """
+    selected_fields = parse_fields(fields)
+    if stream:
+        return StreamingResponse(
+            asyncUserService.export_users(selected_fields, chunk_size),
+            media_type="application/x-ndjson",
+        )
+    users, next_cursor = await asyncUserService.list_users(
+        cursor, limit, selected_fields
+    )
+    return Response(
+        render_json({"items": users, "next_cursor": next_cursor}),
+        media_type="application/json",
+    )
+
+
+@router.get(
+    "/current",
+    response_model=UserDto,
+    responses={
+        "304": {"description": "Not Modified, the If-None-Match ETag matches"},
+        "401": {"model": responses.Unauthorized_401},
+        "403": {"model": responses.Forbidden_403},
+    },
+)
+async def get_current_logged_user(
+    if_none_match: str = Header(None),
+    user: UserDto = Depends(get_auth_user_async),
+) -> Response:
+    """
+    Extract the coockie session from request and retrieve the
+    associated user if the cookie token is valid
+    """
+    etag = user_etag(user)
+    if responses.etag_matches(if_none_match, etag):
+        return responses.not_modified(etag)
+    return UserJSONResponse(user, headers={"etag": etag})
+
+
+#######################################
+#          HTTP PUT Operations        #
+#######################################
+
+
+@router.put(
+    "/{user_id}",
+    response_model=UserDto,
+    responses={
+        "401": {"model": responses.Unauthorized_401},
+        "403": {"model": responses.Forbidden_403},
+        "409": {"model": responses.Conflict_409},
+        "503": {"model": responses.ServiceUnavailable_503},
+    },
+    dependencies=admission("update_user"),
+)
+async def update_user_info(
+    user_id: int,
+    user_info: UserUpdateDto,
+    if_match: str = Header(None),
+    curret_user=Depends(get_auth_user_for_write_async),
+) -> UserJSONResponse:
+    """
+    Update the user only if the session is active.
+
+    Only the fields that differ from the stored user are written. With
+    `If-Match`, the request is rejected (409) if the user has been
+    modified since the client got that ETag, even if nothing changes.
+    """
+    if curret_user.id != user_id:
+        responses.raise_http_exception.forbidden("Forbidden")
+    fields = user_update_fields(user_info)
+    user = await asyncUserService.update_user(user_id, fields, if_match)
+    response = UserJSONResponse(user)
+    if AUTH_FAT_TOKENS:
+        # New session claims (and token version) after the update
+        set_session_cookie(response, user)
+    return response
@@ -0,0 +1,272 @@
+"""
+Bulk users import from CSV or NDJSON.
+"""
+
+import csv
+import io
+import json
+import time
+from concurrent.futures import Future
+from typing import Iterable, Iterator, List, Tuple
+
+from django.db import connection, router, transaction
+from django.db.utils import IntegrityError
+from django.utils import timezone
+
+from services.auth.hashing import PasswordHasher
+from services.db import db_connection
+
+from .models import User
+from .shcemas import UserImportError, UserImportReport
+
+
+# (line, email, name, password)
+ImportRow = Tuple[int, str, str, str]
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+
+#######################################
+#            User Importer            #
+#######################################
+
+
+class UserImporter:
+    """
+    Create many users at once.
+
+    Password hashing of a batch runs in a bounded process pool while
+    the previous batch is written, rows are loaded with COPY on PostgreSQL
+    (or `bulk_create` on other databases). Rows with an email that
+    already exists are reported and skipped, the rest are created.
+    Only the writes take a pooled DB connection, never the hashing.
+
+    Params:
+    - batch_size: int - Rows per load
+    - workers: int - Hashing processes (0 hashes inline), if no `hasher`
+    - method: str - "copy", "bulk" or "auto" (copy on PostgreSQL)
+    - hasher: PasswordHasher - A shared hasher, it is not shut down
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 1000,
+        workers: int = 4,
+        method: str = "auto",
+        hasher: PasswordHasher = None,
+    ):
+        self.batch_size = batch_size
+        self.owns_hasher = hasher is None
+        # A chunk queued per process keeps the pool busy between chunks
+        self.hasher = hasher or PasswordHasher(workers=workers, queue_depth=workers)
+        if method == "auto":
+            method = "copy" if connection.vendor == "postgresql" else "bulk"
+        self.method = method
+
+    #######################################
+    #              Parsing                #
+    #######################################
+
+    def parse(
+        self, lines: Iterable[str], fmt: str, errors: List[UserImportError]
+    ) -> Iterator[ImportRow]:
+        """
+        Parse and validate the input rows, invalid rows go to `errors`.
+
+        CSV input needs a header with `email`, `password` and `name`.
+        NDJSON input needs one object per line with the same keys.
+        """
+        if fmt == "csv":
+            reader = csv.DictReader(lines)
+            records = ((reader.line_num, record) for record in reader)
+        else:
+            records = self._parse_ndjson(lines, errors)
+
+        seen = set()
+        for line, record in records:
+            email = (record.get("email") or "").strip()
+            password = record.get("password") or ""
+            name = (record.get("name") or "").strip()
+            if "@" not in email or not password:
+                errors.append(
+                    UserImportError(
+                        line=line,
+                        email=email or None,
+                        detail="Email and password required",
+                    )
+                )
+                continue
+            if email in seen:
+                errors.append(
+                    UserImportError(line=line, email=email, detail="Duplicated email")
+                )
+                continue
+            seen.add(email)
+            yield line, email, name, password
+
+    def _parse_ndjson(self, lines: Iterable[str], errors: List[UserImportError]):
+        for line, raw in enumerate(lines, start=1):
+            if not raw.strip():
+                continue
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                errors.append(UserImportError(line=line, detail="Invalid JSON"))
+                continue
+            if not isinstance(record, dict):
+                errors.append(UserImportError(line=line, detail="Invalid JSON"))
+                continue
+            yield line, record
+
+    #######################################
+    #              Loading                #
+    #######################################
+
+    def run(self, lines: Iterable[str], fmt: str = "csv") -> UserImportReport:
+        """
+        Import the users.
+
+        Params:
+        - lines: Iterable[str] - The input lines
+        - fmt: str - "csv" or "ndjson"
+        Return:
+        - report: UserImportReport - Created count, errors and throughput
+        """
+        start = time.perf_counter()
+        errors: List[UserImportError] = []
+        created = 0
+
+        # Hash the batch N + 1 while the batch N is loaded
+        pending = None
+        try:
+            for batch in self._batches(self.parse(lines, fmt, errors)):
+                futures = self.hasher.submit_passwords([row[3] for row in batch])
+                if pending:
+                    created += self._load(*pending, errors)
+                pending = (batch, futures)
+            if pending:
+                created += self._load(*pending, errors)
+        finally:
+            if self.owns_hasher:
+                self.hasher.shutdown()
+
+        elapsed = time.perf_counter() - start
+        errors.sort(key=lambda error: error.line)
+        return UserImportReport(
+            created=created,
+            errors=errors,
+            elapsed=round(elapsed, 3),
+            rows_per_second=round(created / elapsed, 1) if elapsed else 0.0,
+        )
+
+    def _batches(self, rows: Iterator[ImportRow]) -> Iterator[List[ImportRow]]:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _load(
+        self,
+        batch: List[ImportRow],
+        futures: List[Future],
+        errors: List[UserImportError],
+    ) -> int:
+        hashed = [password for future in futures for password in future.result()]
+        return self._write(batch, hashed, errors)
+
+    @db_connection
+    def _write(
+        self,
+        batch: List[ImportRow],
+        hashed: List[str],
+        errors: List[UserImportError],
+    ) -> int:
+        # From the primary, a replica may not have the latest users yet
+        users_db = User.objects.db_manager(router.db_for_write(User))
+        existing = set(
+            users_db.filter(email__in=[row[1] for row in batch]).values_list(
+                "email", flat=True
+            )
+        )
+        users = []
+        for (line, email, name, _), password in zip(batch, hashed):
+            if email in existing:
+                errors.append(
+                    UserImportError(
+                        line=line, email=email, detail="Email already exists"
+                    )
+                )
+                continue
+            users.append((line, email, name, password))
+
+        try:
+            with transaction.atomic():
+                if self.method == "copy":
+                    self._copy(users)
+                else:
+                    self._bulk_create(users)
+        except IntegrityError:
+            # An email was taken meanwhile, fall back to row by row
+            return self._create_one_by_one(users, errors)
+        return len(users)
+
+    def _copy(self, users: List[ImportRow]) -> None:
+        now = timezone.now().isoformat()
+        fields = [
+            "email",
+            "name",
+            "password",
+            "is_superuser",
+            "is_staff",
+            "is_active",
+            "date_joined",
+            "created_at",
+            "updated_at",
+            "token_version",
+        ]
+        columns = ", ".join(
+            connection.ops.quote_name(User._meta.get_field(field).column)
+            for field in fields
+        )
+        table = connection.ops.quote_name(User._meta.db_table)
+
+        buffer = io.StringIO()
+        # Strings are always quoted, COPY reads an unquoted empty field as NULL
+        writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+        for _, email, name, password in users:
+            writer.writerow([email, name, password, "f", "f", "t", now, now, now, 0])
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+
+    def _bulk_create(self, users: List[ImportRow]) -> None:
+        User.objects.bulk_create(
+            [
+                User(email=email, name=name, password=password)
+                for _, email, name, password in users
+            ],
+            batch_size=self.batch_size,
+        )
+
+    def _create_one_by_one(
+        self, users: List[ImportRow], errors: List[UserImportError]
+    ) -> int:
+        created = 0
+        for line, email, name, password in users:
+            try:
+                with transaction.atomic():
+                    User.objects.create(email=email, name=name, password=password)
+                created += 1
+            except IntegrityError:
+                errors.append(
+                    UserImportError(
+                        line=line, email=email, detail="Email already exists"
+                    )
+                )
+        return created
@@ -0,0 +1,44 @@
+"""
+Bulk import users from a CSV or NDJSON file.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.settings import USER_IMPORT_WORKERS
+from users.importer import IMPORT_FORMATS, UserImporter
+
+
+class Command(BaseCommand):
+    help = "Create users from a CSV (email,name,password header) or NDJSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="The input file")
+        parser.add_argument("--format", choices=IMPORT_FORMATS, default=None)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--workers", type=int, default=USER_IMPORT_WORKERS)
+        parser.add_argument(
+            "--method", choices=("auto", "copy", "bulk"), default="auto"
+        )
+
+    def handle(self, *args, **options):
+        fmt = options["format"]
+        if fmt is None:
+            fmt = "ndjson" if options["path"].endswith((".ndjson", ".jsonl")) else "csv"
+
+        importer = UserImporter(
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+            method=options["method"],
+        )
+        try:
+            with open(options["path"], newline="") as lines:
+                report = importer.run(lines, fmt)
+        except OSError as error:
+            raise CommandError(str(error))
+
+        for error in report.errors:
+            self.stderr.write(f"line {error.line}: {error.email} - {error.detail}")
+        self.stdout.write(
+            f"Created {report.created} users in {report.elapsed}s "
+            f"({report.rows_per_second} rows/s), {len(report.errors)} errors"
+        )
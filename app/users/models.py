@@ -35,6 +35,15 @@ class User(AbstractUser):
     name = models.TextField(verbose_name="Name", max_length=124)
     password = models.TextField(max_length=1240)
 
+    # Bumped on password, email or name change, revokes the session tokens
+    token_version = models.PositiveIntegerField(default=0)
+
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Keyset pagination of the users listing
+        indexes = [
+            models.Index(fields=["created_at", "id"]),
+        ]
@@ -0,0 +1,113 @@
+"""
+User serialization fast path.
+
+Encode the public user fields straight to JSON bytes, skipping the
+model hydration and the response_model validation of FastAPI. The output
+is the same as the one of `UserDto` through the default JSONResponse.
+"""
+
+import calendar
+from datetime import datetime, timedelta, timezone
+from typing import Any, List, Union
+
+from starlette.responses import Response
+
+from services.metrics import timed
+from services.responses import json_dumps
+
+from .models import User
+from .shcemas import UserDto
+
+
+#######################################
+#         Public User Fields          #
+#######################################
+
+# Same fields (and order) that `UserDto` exposes
+USER_PUBLIC_FIELDS = ("id", "email", "name", "created_at", "updated_at")
+
+
+def user_row(user: Union[User, UserDto, dict]) -> dict:
+    """
+    Extract the public fields of a user.
+
+    Params:
+    - user: User | UserDto | dict - A model, a DTO or a `.values()` row
+    Return:
+    - row: dict - The public fields only
+    """
+    if isinstance(user, dict):
+        return {field: user[field] for field in USER_PUBLIC_FIELDS}
+    return {field: getattr(user, field) for field in USER_PUBLIC_FIELDS}
+
+
+def render_json(content: Any) -> bytes:
+    """Encode plain data (dicts, lists, datetimes...) as compact JSON bytes"""
+    with timed("encode"):
+        return json_dumps(content)
+
+
+def render_user(user: Union[User, UserDto, dict]) -> bytes:
+    """Encode the public user fields as JSON bytes"""
+    return render_json(user_row(user))
+
+
+def user_etag(user: Union[User, UserDto, dict]) -> str:
+    """
+    Strong ETag of the user representation, from its id and `updated_at`
+    (every write changes it), so no body is needed to compute it.
+
+    Params:
+    - user: User | UserDto | dict - A model, a DTO or a `.values()` row
+    Return:
+    - etag: str - The quoted entity tag
+    """
+    if isinstance(user, dict):
+        user_id, updated_at = user["id"], user["updated_at"]
+    else:
+        user_id, updated_at = user.id, user.updated_at
+    # Microseconds since epoch, exact (no float rounding)
+    version = calendar.timegm(updated_at.utctimetuple()) * 1_000_000
+    return f'"{user_id}-{version + updated_at.microsecond}"'
+
+
+def parse_user_etags(header: str, user_id: int) -> List[datetime]:
+    """
+    The `updated_at` versions of a user in an `If-Match` header.
+
+    Params:
+    - header: str - A list of ETags built by `user_etag`
+    - user_id: int - Only the ETags of this user are taken
+    Return:
+    - versions: List[datetime] - The (UTC) `updated_at` of each ETag
+    """
+    versions = []
+    for etag in header.split(","):
+        etag_user_id, _, version = etag.strip().strip('"').partition("-")
+        if etag_user_id == str(user_id) and version.isdigit():
+            epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+            versions.append(epoch + timedelta(microseconds=int(version)))
+    return versions
+
+
+#######################################
+#          Response Classes           #
+#######################################
+
+
+class UserJSONResponse(Response):
+    """
+    JSON response for a user, returning it from a route skips the
+    response_model validation and the `jsonable_encoder` step.
+    It carries the user ETag.
+    """
+
+    media_type = "application/json"
+
+    def __init__(self, content, status_code: int = 200, headers: dict = None, **kw):
+        headers = dict(headers or {})
+        headers.setdefault("etag", user_etag(content))
+        super().__init__(content, status_code, headers, **kw)
+
+    def render(self, content: Union[User, UserDto, dict]) -> bytes:
+        return render_user(content)
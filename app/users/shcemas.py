@@ -2,7 +2,7 @@
 User schemas - DataTransferObjects (DTO).
 """
 
-from typing import Optional
+from typing import List, Optional
 from pydantic_django import PydanticDjangoModel
 from pydantic import BaseModel, Field
 from .models import User
@@ -32,6 +32,7 @@ class UserDto(PydanticDjangoModel):
             "groups",
             "user_permissions",
             "last_login",
+            "token_version",
         ]
         schema_extra = {
             "example": {
@@ -74,3 +75,43 @@ class UserUpdateDto(BaseModel):
     name: Optional[str] = Field(None, example="Guido V.R")
     email: Optional[str] = Field(None, example="guido@python.com")
     password: Optional[str] = Field(None, example="pythonico")
+
+
+#######################################
+#         User Listing Schemas        #
+#######################################
+
+
+class UserPageDto(BaseModel):
+    """
+    Pydantic schema for a page of the users listing.
+    """
+
+    items: List[dict] = Field(..., example=[UserDto.Config.schema_extra["example"]])
+    next_cursor: Optional[str] = Field(None, example="MjAyMC0wOS0zMFQwMzowNToxNHwx")
+
+
+#######################################
+#          User Import Schemas        #
+#######################################
+
+
+class UserImportError(BaseModel):
+    """
+    A row of a bulk import that was not created.
+    """
+
+    line: int = Field(..., example=2)
+    email: Optional[str] = Field(None, example="tiangolo@email.com")
+    detail: str = Field(..., example="Email already exists")
+
+
+class UserImportReport(BaseModel):
+    """
+    Pydantic schema for the result of a bulk import.
+    """
+
+    created: int = Field(..., example=10000)
+    errors: List[UserImportError] = []
+    elapsed: float = Field(..., example=4.2)
+    rows_per_second: float = Field(..., example=2380.9)
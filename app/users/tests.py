@@ -0,0 +1,151 @@
+"""
+Users tests, run them with `python manage.py test users`.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from fastapi import HTTPException
+
+from services.auth.hashing import PasswordHasher
+
+from .importer import UserImporter
+from .models import User
+from .serializers import user_etag
+from .shcemas import UserUpdateDto
+from .views import _update_user_returning, user_update_fields, userService
+
+
+#######################################
+#            Update User              #
+#######################################
+
+# The service runs in the DB connection pool threads, so the tests
+# commit their data (TransactionTestCase) to make it visible there.
+
+
+class UpdateUserTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create(
+            email="guido@python.com", name="Guido", password="-"
+        )
+
+    def update(self, if_match: str = None, **fields) -> dict:
+        info = user_update_fields(UserUpdateDto(**fields))
+        return userService.update_user(self.user.id, info, if_match)
+
+    def test_stale_session_does_not_lose_the_update(self):
+        # A fat token still claims "Guido", another session renamed the user
+        User.objects.filter(id=self.user.id).update(name="Guido V.R")
+
+        user = self.update(name="Guido")
+
+        self.assertEqual(user["name"], "Guido")
+        self.assertEqual(User.objects.get(id=self.user.id).name, "Guido")
+
+    def test_unchanged_fields_are_not_written(self):
+        user = self.update(name="Guido", email="guido@python.com")
+
+        stored = User.objects.get(id=self.user.id)
+        self.assertEqual(user["updated_at"], stored.updated_at)
+        self.assertEqual(stored.updated_at, self.user.updated_at)
+        self.assertEqual(stored.token_version, 0)
+
+    def test_unchanged_update_is_one_read_without_write(self):
+        with CaptureQueriesContext(connection) as context:
+            user, written = _update_user_returning(
+                self.user.id, {"name": "Guido"}, None
+            )
+
+        statements = [
+            query["sql"].split()[0]
+            for query in context.captured_queries
+            if query["sql"] != "BEGIN"
+        ]
+        self.assertEqual(statements, ["SELECT"])
+        self.assertFalse(written)
+        self.assertEqual(user["updated_at"], self.user.updated_at)
+
+    def test_name_change_revokes_the_session_tokens(self):
+        user = self.update(name="Guido V.R")
+
+        self.assertEqual(user["token_version"], 1)
+
+    def test_stale_if_match_is_rejected_without_changes(self):
+        stale = user_etag(
+            {"id": self.user.id, "updated_at": self.user.updated_at - timedelta(1)}
+        )
+
+        with self.assertRaises(HTTPException) as error:
+            self.update(if_match=stale, name="Guido")
+        self.assertEqual(error.exception.status_code, 409)
+
+    def test_current_if_match_is_accepted(self):
+        user = self.update(if_match=user_etag(self.user), name="Guido V.R")
+
+        self.assertEqual(user["name"], "Guido V.R")
+
+    def test_missing_user(self):
+        User.objects.filter(id=self.user.id).delete()
+
+        with self.assertRaises(HTTPException) as error:
+            self.update(name="Guido")
+        self.assertEqual(error.exception.status_code, 404)
+
+
+#######################################
+#            Import Users             #
+#######################################
+
+
+class CountingPool:
+    """
+    Thread pool standing in for the hashing processes, it records the
+    max number of chunks in the pool at the same time.
+    """
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=8)
+        self.lock = threading.Lock()
+        self.in_pool = 0
+        self.max_in_pool = 0
+
+    def run(self, func, *args):
+        time.sleep(0.01)
+        return func(*args)
+
+    def submit(self, func, *args):
+        with self.lock:
+            self.in_pool += 1
+            self.max_in_pool = max(self.max_in_pool, self.in_pool)
+        future = self.executor.submit(self.run, func, *args)
+        future.add_done_callback(self.done)
+        return future
+
+    def done(self, _):
+        with self.lock:
+            self.in_pool -= 1
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class ImportUsersTests(TransactionTestCase):
+    def test_queued_import_does_not_exceed_the_hasher_bound(self):
+        hasher = PasswordHasher(workers=1, queue_depth=2)
+        pool = CountingPool()
+        hasher._get_pool = lambda: pool
+        # 10 chunks of 64 passwords per batch
+        lines = ["email,name,password"] + [
+            f"user{i}@python.com,User {i},pw-{i}" for i in range(1280)
+        ]
+
+        report = UserImporter(batch_size=640, hasher=hasher).run(lines, "csv")
+
+        self.assertEqual(report.created, 1280)
+        self.assertEqual(pool.max_in_pool, 3)
+        user = User.objects.get(email="user7@python.com")
+        self.assertTrue(user.check_password("pw-7"))
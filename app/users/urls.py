@@ -2,16 +2,37 @@
 User router
 """
 
-from fastapi import APIRouter, Body, Response, Depends, BackgroundTasks
+from fastapi import APIRouter, Body, Depends, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from django.conf.global_settings import SESSION_COOKIE_AGE
 
-from app.settings import DEBUG
+from app.settings import AUTH_FAT_TOKENS, DEBUG
 from services import responses
-from services.auth.utils import COOKIE_SESSION_NAME, create_access_token, get_auth_user
-from services.email import send_welcome_email, send_recovery_password_email
+from services.auth.utils import (
+    COOKIE_SESSION_NAME,
+    create_session_token,
+    get_admin_user,
+    get_auth_user,
+    get_auth_user_for_write,
+)
 
-from .views import userService
-from .shcemas import UserDto, UserCreateDto, LoginUserDto, UserUpdateDto
+from .admission import admission
+from .views import (
+    userService,
+    user_update_fields,
+    parse_fields,
+    parse_import_format,
+)
+from .shcemas import (
+    UserDto,
+    UserCreateDto,
+    LoginUserDto,
+    UserUpdateDto,
+    UserPageDto,
+    UserImportReport,
+)
+from .serializers import UserJSONResponse, render_json, user_etag
 
 
 #######################################
@@ -32,17 +53,18 @@ router = APIRouter()
     response_model=UserDto,
     responses={
         "409": {"model": responses.Conflict_409},
+        "503": {"model": responses.ServiceUnavailable_503},
     },
+    dependencies=admission("signup"),
 )
-def create_a_new_user(
-    user_info: UserCreateDto, response: Response, background_task: BackgroundTasks
-) -> UserDto:
+def create_a_new_user(user_info: UserCreateDto) -> UserJSONResponse:
     """
     Signup: create a new user
     """
     user = userService.create_user(user_info)
-    token = create_access_token(user.email)
+    token = create_session_token(user)
 
+    response = UserJSONResponse(user, status_code=201)
     response.set_cookie(
         key=COOKIE_SESSION_NAME,
         value=token,
@@ -50,13 +72,7 @@ def create_a_new_user(
         secure=not DEBUG,
         httponly=not DEBUG,
     )
-
-    background_task.add_task(
-        send_welcome_email,
-        username=user.name,
-        email=user.email,
-    )
-    return user
+    return response
 
 
 @router.post(
@@ -64,15 +80,19 @@ def create_a_new_user(
     response_model=UserDto,
     responses={
         "401": {"model": responses.Unauthorized_401},
+        "429": {"model": responses.TooManyRequests_429},
+        "503": {"model": responses.ServiceUnavailable_503},
     },
+    dependencies=admission("login"),
 )
-def login_a_user(credentials: LoginUserDto, response: Response) -> UserDto:
+def login_a_user(credentials: LoginUserDto) -> UserJSONResponse:
     """
     Login: Validate the user credentials and create a cookie session
     """
     user = userService.login_user(credentials)
-    token = create_access_token(user.email)
+    token = create_session_token(user)
 
+    response = UserJSONResponse(user)
     response.set_cookie(
         key=COOKIE_SESSION_NAME,
         value=token,
@@ -80,33 +100,35 @@ def login_a_user(credentials: LoginUserDto, response: Response) -> UserDto:
         secure=not DEBUG,
         httponly=not DEBUG,
     )
-    return user
+    return response
 
 
 @router.post(
     "/password-recovery/{email}",
     response_model=responses.EmailMsg,
-    responses={"404": {"model": responses.NotFound_404}},
+    responses={
+        "404": {"model": responses.NotFound_404},
+        "429": {"model": responses.TooManyRequests_429},
+    },
+    dependencies=admission("password_recovery"),
 )
-def sent_recovery_password_email(email: str, background_task: BackgroundTasks) -> any:
+def sent_recovery_password_email(email: str) -> any:
     """
     Verify is the email belogs to an active user and
     send a recovery password email.
     """
-    token = userService.get_token_recovery_password(email)
-
-    background_task.add_task(
-        send_recovery_password_email,
-        token=token,
-        email=email,
-    )
+    userService.request_password_recovery(email)
     return responses.EmailMsg(detail="Password recovery email sent")
 
 
 @router.post(
     "/reset-password",
     response_model=responses.Msg,
-    responses={"404": {"model": responses.NotFound_404}},
+    responses={
+        "404": {"model": responses.NotFound_404},
+        "503": {"model": responses.ServiceUnavailable_503},
+    },
+    dependencies=admission("reset_password"),
 )
 def reset_password(token: str = Body(...), new_password: str = Body(...)) -> any:
     """
@@ -119,25 +141,90 @@ def reset_password(token: str = Body(...), new_password: str = Body(...)) -> any
     return responses.Msg(detail="Password updated successfully")
 
 
+@router.post(
+    "/import",
+    response_model=UserImportReport,
+    responses={
+        "400": {"model": responses.BadRequest_400},
+        "401": {"model": responses.Unauthorized_401},
+        "403": {"model": responses.Forbidden_403},
+    },
+)
+async def import_users(
+    request: Request, admin=Depends(get_admin_user)
+) -> UserImportReport:
+    """
+    Bulk create users (admin only) from a `text/csv` body with an
+    email,name,password header or an `application/x-ndjson` body.
+    Rows with an existing email are reported, not created.
+    """
+    fmt = parse_import_format(request.headers.get("content-type"))
+    lines = (await request.body()).decode("utf-8").splitlines()
+    return await run_in_threadpool(userService.import_users, lines, fmt)
+
+
 #######################################
 #         HTTP GET Operations         #
 #######################################
 
 
+@router.get(
+    "",
+    response_model=UserPageDto,
+    responses={
+        "200": {"content": {"application/x-ndjson": {}}},
+        "400": {"model": responses.BadRequest_400},
+        "401": {"model": responses.Unauthorized_401},
+        "403": {"model": responses.Forbidden_403},
+    },
+)
+def list_users(
+    cursor: str = Query(None, description="The next_cursor of the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+    fields: str = Query(None, description="Comma separated fields, e.g. id,email"),
+    stream: bool = Query(False, description="Stream all the users as NDJSON"),
+    chunk_size: int = Query(2000, ge=1, le=10000),
+    admin=Depends(get_admin_user),
+) -> Response:
+    """
+    List the users (admin only), ordered by creation date.
+
+    Paginated with a keyset cursor, or streamed as NDJSON with `stream=true`.
+    """
+    selected_fields = parse_fields(fields)
+    if stream:
+        return StreamingResponse(
+            userService.export_users(selected_fields, chunk_size),
+            media_type="application/x-ndjson",
+        )
+    users, next_cursor = userService.list_users(cursor, limit, selected_fields)
+    return Response(
+        render_json({"items": users, "next_cursor": next_cursor}),
+        media_type="application/json",
+    )
+
+
 @router.get(
     "/current",
     response_model=UserDto,
     responses={
+        "304": {"description": "Not Modified, the If-None-Match ETag matches"},
         "401": {"model": responses.Unauthorized_401},
         "403": {"model": responses.Forbidden_403},
     },
 )
-def get_current_logged_user(user: UserDto = Depends(get_auth_user)) -> UserDto:
+def get_current_logged_user(
+    if_none_match: str = Header(None),
+    user: UserDto = Depends(get_auth_user),
+) -> Response:
     """
     Extract the coockie session from request and retrieve the
     associated user if the cookie token is valid
     """
-    return user
+    etag = user_etag(user)
+    if responses.etag_matches(if_none_match, etag):
+        return responses.not_modified(etag)
+    return UserJSONResponse(user, headers={"etag": etag})
 
 
 #######################################
@@ -152,15 +239,35 @@ def get_current_logged_user(user: UserDto = Depends(get_auth_user)) -> UserDto:
         "401": {"model": responses.Unauthorized_401},
         "403": {"model": responses.Forbidden_403},
         "409": {"model": responses.Conflict_409},
+        "503": {"model": responses.ServiceUnavailable_503},
     },
+    dependencies=admission("update_user"),
 )
 def update_user_info(
-    user_id: int, user_info: UserUpdateDto, curret_user=Depends(get_auth_user)
-) -> UserDto:
+    user_id: int,
+    user_info: UserUpdateDto,
+    if_match: str = Header(None),
+    curret_user=Depends(get_auth_user_for_write),
+) -> UserJSONResponse:
     """
     Update the user only if the session is active.
+
+    Only the fields that differ from the stored user are written. With
+    `If-Match`, the request is rejected (409) if the user has been
+    modified since the client got that ETag, even if nothing changes.
     """
     if curret_user.id != user_id:
         responses.raise_http_exception.forbidden("Forbidden")
-    user = userService.update_user(user_id, user_info)
-    return user
+    fields = user_update_fields(user_info)
+    user = userService.update_user(user_id, fields, if_match)
+    response = UserJSONResponse(user)
+    if AUTH_FAT_TOKENS:
+        # New session claims (and token version) after the update
+        response.set_cookie(
+            key=COOKIE_SESSION_NAME,
+            value=create_session_token(user),
+            max_age=SESSION_COOKIE_AGE,
+            secure=not DEBUG,
+            httponly=not DEBUG,
+        )
+    return response
@@ -2,13 +2,224 @@
 View services layer for Users opearions.
 """
 
+import base64
+from datetime import datetime
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import connections, router, transaction
+from django.db.models import F, Q
 from django.db.utils import IntegrityError
+from django.utils import timezone
+from starlette.concurrency import run_in_threadpool
 
 from services.responses import raise_http_exception
-from services.auth.utils import create_access_token, get_from_verify_token
+from services.auth.utils import (
+    create_access_token,
+    get_from_verify_token,
+    invalidate_auth_user,
+)
+from services.auth.hashing import import_hasher, password_hasher
+from services.db import db_connection, run_in_db
+from mailing.outbox import enqueue_email
 
 from .models import User
-from .shcemas import UserDto, UserCreateDto, LoginUserDto, UserUpdateDto
+from .shcemas import (
+    UserCreateDto,
+    LoginUserDto,
+    UserUpdateDto,
+    UserImportReport,
+)
+from .importer import UserImporter
+from .serializers import (
+    USER_PUBLIC_FIELDS,
+    parse_user_etags,
+    render_json,
+    user_row,
+)
+
+
+#######################################
+#      Keyset Pagination Helpers      #
+#######################################
+
+# The listing is ordered by (created_at, id), the cursor is the
+# position of the last returned row, so no OFFSET is needed.
+
+
+def encode_cursor(created_at: datetime, user_id: int) -> str:
+    """Build the opaque cursor of a row"""
+    raw = f"{created_at.isoformat()}|{user_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Parse an opaque cursor, raise a 400 if it is invalid"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, user_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(user_id)
+    except ValueError:
+        raise_http_exception.bad_request("Invalid cursor")
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """Validate a comma separated projection of the public user fields"""
+    if not fields:
+        return list(USER_PUBLIC_FIELDS)
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = set(selected) - set(USER_PUBLIC_FIELDS)
+    if unknown:
+        unknown_fields = ", ".join(sorted(unknown))
+        raise_http_exception.bad_request(f"Unknown fields: {unknown_fields}")
+    return selected
+
+
+def parse_import_format(content_type: Optional[str]) -> str:
+    """Pick the bulk import format from the request content type"""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type == "text/csv":
+        return "csv"
+    if media_type in ("application/x-ndjson", "application/jsonl"):
+        return "ndjson"
+    raise_http_exception.bad_request("Use text/csv or application/x-ndjson")
+
+
+#######################################
+#         Partial Update Helpers      #
+#######################################
+
+# Returned by the update statement
+USER_UPDATE_RETURNING = USER_PUBLIC_FIELDS + ("token_version",)
+
+# Fields whose change revokes the session tokens, the fat tokens carry
+# the email and the name as claims
+REVOKING_FIELDS = ("password", "email", "name")
+
+
+def user_update_fields(user_info: UserUpdateDto) -> dict:
+    """
+    The fields sent by the client. They are compared with the user inside
+    the update statement, never with the (maybe stale) authenticated user.
+
+    Params:
+    - user_info: UserUpdateDto - The info for update
+    Return:
+    - fields: dict - The provided fields, empty if none
+    """
+    fields = {}
+    if user_info.name:
+        fields["name"] = user_info.name
+    if user_info.email:
+        fields["email"] = user_info.email
+    if user_info.password:
+        fields["password"] = user_info.password
+    return fields
+
+
+def _update_user_returning(
+    user_id: int, values: dict, versions: Optional[List[datetime]]
+) -> Optional[Tuple[dict, bool]]:
+    """
+    Lock the user and update the given columns (and `updated_at`) in a
+    single statement, only if `updated_at` is one of the `versions` (when
+    given) and a value differs from the stored one (a password is always a
+    change). A password change, or a change of the fat token claims
+    (email, name), also revokes the session tokens (`token_version`).
+
+    Return:
+    - (user, written): The row after the update and its `previous_email`,
+      or the locked row unchanged (a failed precondition or no change).
+      None if the user does not exist.
+    """
+    # The router also pins the request to the primary (read your writes)
+    alias = router.db_for_write(User)
+    now = timezone.now()
+    revoke = any(field in values for field in REVOKING_FIELDS)
+    compared = [field for field in values if field != "password"]
+
+    if connections[alias].vendor != "postgresql":
+        # Lock, compare and update where RETURNING is not available
+        with transaction.atomic(using=alias):
+            users = User.objects.using(alias).select_for_update().filter(id=user_id)
+            current = users.values(*USER_UPDATE_RETURNING).first()
+            if current is None:
+                return None
+            if versions is not None and current["updated_at"] not in versions:
+                return current, False
+            if len(compared) == len(values) and all(
+                current[field] == values[field] for field in compared
+            ):
+                return current, False
+            extra = {"token_version": F("token_version") + 1} if revoke else {}
+            users.update(**values, **extra, updated_at=now)
+            user = users.values(*USER_UPDATE_RETURNING).first()
+        user["previous_email"] = current["email"]
+        return user, True
+
+    connection = connections[alias]
+    quote_name = connection.ops.quote_name
+    table = quote_name(User._meta.db_table)
+
+    def column(field: str) -> str:
+        return quote_name(User._meta.get_field(field).column)
+
+    columns = ", ".join(column(field) for field in USER_UPDATE_RETURNING)
+    # The current row is locked first, so the comparison, the returned
+    # previous email and the unchanged row are the latest committed version
+    params = [user_id]
+    previous = f"SELECT {columns} FROM {table} WHERE {column('id')} = %s FOR UPDATE"
+
+    assignments = [f"{column(field)} = %s" for field in values]
+    params.extend(values.values())
+    assignments.append(f"{column('updated_at')} = %s")
+    params.append(now)
+    if revoke:
+        version = column("token_version")
+        assignments.append(f"{version} = {table}.{version} + 1")
+
+    conditions = [f"{table}.{column('id')} = previous.{column('id')}"]
+    if versions is not None:
+        placeholders = ", ".join(["%s"] * len(versions))
+        conditions.append(f"previous.{column('updated_at')} IN ({placeholders})")
+        params.extend(versions)
+    if len(compared) == len(values):
+        changed = " OR ".join(
+            f"previous.{column(field)} IS DISTINCT FROM %s" for field in compared
+        )
+        conditions.append(f"({changed})")
+        params.extend(values[field] for field in compared)
+
+    returning = ", ".join(f"{table}.{column(field)}" for field in USER_UPDATE_RETURNING)
+    # Either the updated row, or the locked one when nothing was written
+    sql = (
+        f"WITH previous AS ({previous}), updated AS ("
+        f"UPDATE {table} SET {', '.join(assignments)} FROM previous "
+        f"WHERE {' AND '.join(conditions)} "
+        f"RETURNING {returning}, previous.{column('email')} AS previous_email) "
+        f"SELECT *, TRUE FROM updated UNION ALL "
+        f"SELECT {columns}, NULL, FALSE FROM previous "
+        f"WHERE NOT EXISTS (SELECT 1 FROM updated)"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    *row, written = row
+    user = dict(zip(USER_UPDATE_RETURNING + ("previous_email",), row))
+    if not written:
+        del user["previous_email"]
+    return user, written
+
+
+def _get_user_row(user_id: int) -> Optional[dict]:
+    """The row `_update_user_returning` would return, from the primary"""
+    return (
+        User.objects.using(router.db_for_write(User))
+        .filter(id=user_id)
+        .values(*USER_UPDATE_RETURNING)
+        .first()
+    )
 
 
 #######################################
@@ -21,62 +232,114 @@ class UsersViewsService:
     Bussines Logic about users.
     """
 
-    def create_user(self, user_info: UserCreateDto) -> UserDto:
+    # The password hashing (PBKDF2) runs before taking a DB connection,
+    # so a slow hash never holds a slot of the pool.
+
+    def create_user(self, user_info: UserCreateDto) -> dict:
         """
         Create a new user and return his/her info.
 
         Params:
         - user_info: USerCreateDto - The input user info.
         Returns:
-        - user: UserDto - The created user
+        - user: dict - The public fields of the created user
         """
+        encoded = password_hasher.make_password(user_info.password)
+        return self._insert_user(user_info, encoded)
+
+    @db_connection
+    def _insert_user(self, user_info: UserCreateDto, encoded: str) -> dict:
+        """Store a new user with an already hashed password"""
         try:
-            user = User(name=user_info.name, email=user_info.email)
-            user.set_password(user_info.password)
-            user.save()
+            user = User(name=user_info.name, email=user_info.email, password=encoded)
+            with transaction.atomic():
+                user.save()
+                enqueue_email("welcome", user.email, username=user.name)
         except IntegrityError:
             raise_http_exception.conflict("Email already exists")
-        return UserDto.from_django(user)
+        return user_row(user)
 
-    def login_user(self, credentials: LoginUserDto) -> UserDto:
+    def login_user(self, credentials: LoginUserDto) -> dict:
         """
         Check user credentials and return the user info.
 
         Params:
         - credentials: LoginUserDto - The user credentials.
         Returns:
-        - user: UserDto - The logged user
+        - user: dict - The public fields (and token version) of the logged user
         """
-        user = User.objects.filter(email=credentials.email).first()
-        if not user or not user.check_password(credentials.password):
+        user = self._get_login_user(credentials.email)
+        return self._check_login(user, credentials)
+
+    @db_connection
+    def _get_login_user(self, email: str) -> Optional[dict]:
+        """The public fields, token version and hashed password of a user"""
+        return (
+            User.objects.filter(email=email)
+            .values(*USER_PUBLIC_FIELDS, "password", "token_version")
+            .first()
+        )
+
+    @staticmethod
+    def _check_login(user: Optional[dict], credentials: LoginUserDto) -> dict:
+        if not user or not password_hasher.check_password(
+            credentials.password, user.pop("password")
+        ):
             raise_http_exception.unauthorized()
-        return UserDto.from_django(user)
+        return user
 
-    def update_user(self, user_id: int, user_info: UserUpdateDto) -> UserDto:
+    def update_user(
+        self, user_id: int, fields: dict, if_match: Optional[str] = None
+    ) -> dict:
         """
-        Update the user info.
+        Update the fields that differ from the stored user, in a single
+        statement.
 
         Params:
         - user_id: str - The user ID for update
-        - user_info: UserUpdateDto - The info for update
+        - fields: dict - The provided fields, see `user_update_fields`
+        - if_match: str - The `If-Match` header, the ETag the client has seen
         Return:
-        - user: UserDto - The user info after update
+        - user: dict - The public fields (and token version) after the update
         """
-        user = User.objects.get(id=user_id)
-        if not user:
+        values = dict(fields)
+        if "password" in values:
+            values["password"] = password_hasher.make_password(values["password"])
+        return self._write_user_update(user_id, values, if_match)
+
+    @db_connection
+    def _write_user_update(
+        self, user_id: int, values: dict, if_match: Optional[str]
+    ) -> dict:
+        """The write of `update_user`, the password is already hashed"""
+        # The precondition, the versions (updated_at) the client has seen
+        versions = None
+        if if_match and if_match.strip() != "*":
+            versions = parse_user_etags(if_match, user_id)
+            if not versions:
+                raise_http_exception.conflict("The user has been modified")
+
+        if values:
+            try:
+                result = _update_user_returning(user_id, values, versions)
+            except IntegrityError:
+                raise_http_exception.conflict("Email already exists")
+        else:
+            user = _get_user_row(user_id)
+            result = None if user is None else (user, False)
+        if result is None:
             raise_http_exception.not_found("User not found")
-        if user_info.name:
-            user.name = user_info.name
-        if user_info.password:
-            user.set_password(user_info.password)
-        if user_info.email:
-            user.email = user_info.email
-        try:
-            user.save()
-        except IntegrityError:
-            raise_http_exception.conflict("Email already exists")
+        user, written = result
+        if not written:
+            # The stored row, a failed precondition or nothing to change
+            if versions is not None and user["updated_at"] not in versions:
+                raise_http_exception.conflict("The user has been modified")
+            return user
+        previous_email = user.pop("previous_email")
+        invalidate_auth_user(*{previous_email, user["email"]})
         return user
 
+    @db_connection
     def get_token_recovery_password(self, email: str) -> str:
         """
         Verify if the email belongs to a current user and
@@ -93,6 +356,85 @@ class UsersViewsService:
 
         return create_access_token(user.email, recovery_password=True)
 
+    @db_connection
+    def request_password_recovery(self, email: str) -> None:
+        """
+        Verify if the email belongs to a current user and enqueue the
+        recovery password email. The token is created when the email is
+        sent, so it is never stored in the outbox.
+
+        Params:
+        - email: str - The user email
+        Return:
+        - None
+        """
+        if not User.objects.filter(email=email).exists():
+            raise_http_exception.not_found("User not found")
+        enqueue_email("recovery_password", email)
+
+    @db_connection
+    def list_users(
+        self, cursor: Optional[str], limit: int, fields: List[str]
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Return a page of users after the cursor.
+
+        Params:
+        - cursor: str - The `next_cursor` of the previous page
+        - limit: int - Max number of users
+        - fields: List[str] - The public fields to return
+        Return:
+        - (users, next_cursor): The page and the cursor for the next one,
+          next_cursor is None on the last page
+        """
+        users = User.objects.order_by("created_at", "id")
+        if cursor:
+            created_at, user_id = decode_cursor(cursor)
+            users = users.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=user_id)
+            )
+        # The sort keys are always fetched to build the cursor
+        columns = set(fields) | {"created_at", "id"}
+        rows = list(users.values(*columns)[:limit])
+
+        next_cursor = None
+        if len(rows) == limit:
+            next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+        return [{field: row[field] for field in fields} for row in rows], next_cursor
+
+    def export_users(self, fields: List[str], chunk_size: int) -> Iterator[bytes]:
+        """
+        Stream all the users as NDJSON, one keyset page per DB round trip.
+
+        Each chunk runs as its own pooled DB call, so memory stays
+        constant and no connection is held while the client reads.
+
+        Params:
+        - fields: List[str] - The public fields to return
+        - chunk_size: int - Rows fetched per query
+        Yield:
+        - lines: bytes - A chunk of NDJSON lines
+        """
+        cursor = None
+        while True:
+            rows, cursor = self.list_users(cursor, chunk_size, fields)
+            if rows:
+                yield b"".join(render_json(row) + b"\n" for row in rows)
+            if cursor is None:
+                return
+
+    def import_users(self, lines: Iterable[str], fmt: str) -> UserImportReport:
+        """
+        Create users in bulk, rows with an existing email are reported.
+
+        Params:
+        - lines: Iterable[str] - CSV or NDJSON lines
+        - fmt: str - "csv" or "ndjson"
+        Return:
+        - report: UserImportReport - Created count, errors and throughput
+        """
+        return UserImporter(hasher=import_hasher).run(lines, fmt)
+
     def reset_password(self, token: str, new_password: str) -> None:
         """
         Verify the token and if it is valid update the user password.
@@ -104,11 +446,94 @@ class UsersViewsService:
         - None
         """
         email = get_from_verify_token(token)
-        user = User.objects.filter(email=email).first()
-        if not user:
+        self._set_password(email, password_hasher.make_password(new_password))
+
+    @db_connection
+    def _set_password(self, email: str, encoded: str) -> None:
+        """Store a hashed password and revoke the session tokens"""
+        updated = User.objects.filter(email=email).update(
+            password=encoded,
+            token_version=F("token_version") + 1,
+            updated_at=timezone.now(),
+        )
+        if not updated:
             raise_http_exception.not_found("User not found")
-        user.set_password(new_password)
-        user.save()
+        invalidate_auth_user(email)
+
+
+class AsyncUsersViewsService:
+    """
+    Async facade over `UsersViewsService`.
+
+    Each operation runs in the DB connection pool, so the DB concurrency is
+    bounded by `DB_MAX_CONNECTIONS` instead of the request threadpool. The
+    password hashing runs in the threadpool, outside the DB pool.
+    """
+
+    def __init__(self, service: UsersViewsService):
+        self.service = service
+
+    async def create_user(self, user_info: UserCreateDto) -> dict:
+        """Async version of `UsersViewsService.create_user`"""
+        encoded = await run_in_threadpool(
+            password_hasher.make_password, user_info.password
+        )
+        return await run_in_db(self.service._insert_user, user_info, encoded)
+
+    async def login_user(self, credentials: LoginUserDto) -> dict:
+        """Async version of `UsersViewsService.login_user`"""
+        user = await run_in_db(self.service._get_login_user, credentials.email)
+        return await run_in_threadpool(self.service._check_login, user, credentials)
+
+    async def update_user(
+        self, user_id: int, fields: dict, if_match: Optional[str] = None
+    ) -> dict:
+        """Async version of `UsersViewsService.update_user`"""
+        values = dict(fields)
+        if "password" in values:
+            values["password"] = await run_in_threadpool(
+                password_hasher.make_password, values["password"]
+            )
+        return await run_in_db(
+            self.service._write_user_update, user_id, values, if_match
+        )
+
+    async def get_token_recovery_password(self, email: str) -> str:
+        """Async version of `UsersViewsService.get_token_recovery_password`"""
+        return await run_in_db(self.service.get_token_recovery_password, email)
+
+    async def request_password_recovery(self, email: str) -> None:
+        """Async version of `UsersViewsService.request_password_recovery`"""
+        return await run_in_db(self.service.request_password_recovery, email)
+
+    async def list_users(
+        self, cursor: Optional[str], limit: int, fields: List[str]
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Async version of `UsersViewsService.list_users`"""
+        return await run_in_db(self.service.list_users, cursor, limit, fields)
+
+    async def export_users(
+        self, fields: List[str], chunk_size: int
+    ) -> AsyncIterator[bytes]:
+        """Async version of `UsersViewsService.export_users`"""
+        cursor = None
+        while True:
+            rows, cursor = await self.list_users(cursor, chunk_size, fields)
+            if rows:
+                yield b"".join(render_json(row) + b"\n" for row in rows)
+            if cursor is None:
+                return
+
+    async def import_users(self, lines: Iterable[str], fmt: str) -> UserImportReport:
+        """Async version of `UsersViewsService.import_users`"""
+        # The importer takes a pooled connection per batch write
+        return await run_in_threadpool(self.service.import_users, lines, fmt)
+
+    async def reset_password(self, token: str, new_password: str) -> None:
+        """Async version of `UsersViewsService.reset_password`"""
+        email = get_from_verify_token(token)
+        encoded = await run_in_threadpool(password_hasher.make_password, new_password)
+        return await run_in_db(self.service._set_password, email, encoded)
 
 
 #######################################
@@ -118,3 +543,4 @@ class UsersViewsService:
 # Allow to centrilize all methods abour user
 
 userService = UsersViewsService()
+asyncUserService = AsyncUsersViewsService(userService)